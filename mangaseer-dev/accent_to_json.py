@@ -1,20 +1,31 @@
-import ujson
-
-
-with open("accents.txt", "r", encoding="utf-8") as f:
-    accents = f.readlines()
-
-
-json_obj = {}
-
-
-for accent in accents:
-    word, reading, pitch = accent.strip().split("\t")
-    if word in json_obj:
-        json_obj[word].append([reading, pitch])
+from argparse import ArgumentParser
+from utils.pitch_accent import generate_accents_json, generate_accents_sqlite, ACCENTS_DB_PATH, ACCENTS_JSON_PATH
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Converts accents.txt into the pitch accent data get_pitch reads.")
+    parser.add_argument("accents", nargs="?", default="accents.txt", help="tab separated word, reading and accents")
+    parser.add_argument(
+        "--format", choices=("sqlite", "json"), default="sqlite",
+        help="sqlite: indexed database read a word at a time (default), json: the old readings.json loaded whole"
+    )
+    parser.add_argument("--output", default=None, help=f"defaults to {ACCENTS_DB_PATH} / {ACCENTS_JSON_PATH}")
+    parser.add_argument(
+        "--jmdict", default=None, metavar="DB",
+        help="also link the accents to the readings of this jmdict database, so lookups return them with each word"
+    )
+    args = parser.parse_args()
+
+    if args.format == "sqlite":
+        output = args.output or ACCENTS_DB_PATH
+        rows = generate_accents_sqlite(args.accents, output)
     else:
-        json_obj[word] = [[reading, pitch]]
+        output = args.output or ACCENTS_JSON_PATH
+        rows = generate_accents_json(args.accents, output)
+
+    print(f"{output}: {rows} {'patterns' if args.format == 'sqlite' else 'readings'}")
 
+    if args.jmdict:
+        from utils.dictionary import link_accents # loads the tag files and sudachi, only needed here
 
-with open("readings.json", "w", encoding="utf-8") as f:
-    ujson.dump(json_obj, f)
+        print(f"{args.jmdict}: {link_accents(args.accents, args.jmdict)} patterns linked to readings")
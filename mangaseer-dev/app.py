@@ -1,10 +1,56 @@
+from time import perf_counter
+started = perf_counter() # for --startup-profile, before anything else is imported
+
+from argparse import ArgumentParser
 from PySide6 import QtWidgets, QtCore, QtGui
-#from ultralytics import YOLOv10
-#from manga_ocr import MangaOcr
-from utils import screenshot, tts, JMDict, KeyboardListener, get_pitch
+from utils import screenshot, tts, KeyboardListener, LookupPrefetcher, GlossSearcher, get_pitch
+from utils.startup import Startup, StartupProfile
 import resources
 
 
+# used both for prefetching and when the dictionary has to look up text itself
+LOOKUP_OPTIONS = {"common": True, "fuzzy": 1}
+
+# how long typing has to pause before the meaning search runs
+SEARCH_DELAY_MS = 150
+
+
+# loaded in background threads by `startup`, in __main__ the window comes up without waiting for them
+def load_dictionary(profile: StartupProfile):
+    with profile.measure("import utils.dictionary"): # tag files, kanji list and sudachipy
+        from utils.dictionary import JMDict
+
+    with profile.measure("JMDict"):
+        return JMDict("jmdict.db", "jmnedict.db", result_cache_path="lookup_cache.db")
+
+
+def load_tokenizer(profile: StartupProfile):
+    from utils.tokenizer import get_tokenizer
+
+    tokenizer = get_tokenizer() # the one JMDict uses
+
+    with profile.measure("sudachi dictionary"):
+        tokenizer.load()
+
+    return tokenizer
+
+
+def load_models(profile: StartupProfile):
+    with profile.measure("import ultralytics"):
+        from ultralytics import YOLOv10
+
+    with profile.measure("YOLOv10"):
+        yolo_model = YOLOv10("models/yolo/yolov10l.pt")
+
+    with profile.measure("import manga_ocr"):
+        from manga_ocr import MangaOcr
+
+    with profile.measure("MangaOcr"):
+        ocr_model = MangaOcr()
+
+    return yolo_model, ocr_model
+
+
 class FlowLayout(QtWidgets.QLayout):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -199,23 +245,30 @@ class DictWord(QtWidgets.QLabel):
         super().__init__(word["text"])
 
         self.word = word
-        self.readings = get_pitch(word["text"])
         self.info_widget = info_widget
 
         self.setStyleSheet("QLabel { font-family: 'Noto Sans JP'; font-size: 20px; border-radius: 5px; } QLabel:hover { background-color: rgba(0, 191, 255, 0.5); }")
         self.setCursor(QtGui.Qt.CursorShape.PointingHandCursor)
 
+        if word.get("fuzzy"): # ocr probably misread this word
+            self.setToolTip(f"Showing results for {word['fuzzy']}")
+
     def mousePressEvent(self, event):
         self.info_widget.clear()
+        # pitch of the readings of the words found, the accents of every homograph if the dictionary has none linked
+        readings = list(dict.fromkeys(word.pitch for word in self.word["words"] if "pitch" in word))
+
+        if not readings:
+            readings = get_pitch(self.word["text"]) # only for the clicked word, not every word in the dialog
 
-        if self.readings:
+        if readings:
             readings_widget = QtWidgets.QWidget()
             readings_widget.setContentsMargins(0, 0, 0, 0)
             readings_layout = FlowLayout()
             readings_layout.setContentsMargins(0, 0, 0, 0)
             readings_widget.setLayout(readings_layout)
 
-            for reading in self.readings:
+            for reading in readings:
                 for pitch_accent in reading:
                     reading_widget = PitchAccent(pitch_accent)
                     readings_layout.addWidget(reading_widget)
@@ -228,6 +281,8 @@ class DictWord(QtWidgets.QLabel):
             self.info_widget.setItemWidget(readings_item, readings_widget)
 
         if self.word["type"] == "word":
+            startup.get("dictionary").hydrate_many(self.word["words"]) # senses are only loaded for the clicked word
+
             for word in self.word["words"]:
                 word_item = QtWidgets.QListWidgetItem(self.info_widget)
                 word_info = WordInfo(word)
@@ -241,10 +296,11 @@ class DictWord(QtWidgets.QLabel):
 
 
 class Dictionary(QtWidgets.QDialog):
-    def __init__(self, parent: QtWidgets.QWidget, text: str):
+    def __init__(self, parent: QtWidgets.QWidget, text: str, words: list[dict] | None = None):
         super().__init__(parent)
 
-        words = jmdict.lookup(text, common=True)
+        if words is None: # not prefetched (yet), waits for the dictionary if it's still loading
+            words = startup.get("dictionary").lookup(text, **LOOKUP_OPTIONS)
 
         self.setWindowTitle("Dictionary")
         self.setFixedWidth(600)
@@ -270,14 +326,75 @@ class Dictionary(QtWidgets.QDialog):
 
             text_layout.addWidget(text_label)
 
+        # english -> japanese search, results update once typing pauses, the query runs in `gloss_searcher`
+        self.info_widget = info_widget
+        self.search_request = None
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.search)
+
+        self.search_input = QtWidgets.QLineEdit()
+        self.search_input.setPlaceholderText("Search by meaning")
+        self.search_input.textChanged.connect(self.search_timer.start) # restarts on every keystroke
+        layout.addWidget(self.search_input)
+
+        self.search_results = QtWidgets.QListWidget()
+        self.search_results.setStyleSheet("QListWidget { font-family: 'Noto Sans JP'; font-size: 15px; }")
+        self.search_results.setMaximumHeight(150)
+        self.search_results.itemClicked.connect(self.show_result)
+        self.search_results.hide()
+        layout.addWidget(self.search_results)
+
         layout.addWidget(info_widget)
 
+    def search(self):
+        if gloss_searcher is None: # the dictionary is still loading
+            startup.when_ready("dictionary", lambda _: self.search())
+            return
+
+        if self.search_request is None:
+            gloss_searcher.found.connect(self.show_search_results)
+
+        self.search_request = gloss_searcher.search(self.search_input.text())
+
+    def show_search_results(self, request: int, query: str, results: list[dict]):
+        if request != self.search_request: # another dialog's, or the text changed since
+            return
+
+        self.search_results.clear()
+
+        for result in results:
+            label = result["text"] + (f" ({result['reading']})" if result["reading"] else "") + f" - {result['gloss']}"
+            item = QtWidgets.QListWidgetItem(label)
+            item.setData(QtCore.Qt.ItemDataRole.UserRole, result)
+            self.search_results.addItem(item)
+
+        self.search_results.setVisible(self.search_results.count() > 0)
+
+    def show_result(self, item: QtWidgets.QListWidgetItem):
+        result = item.data(QtCore.Qt.ItemDataRole.UserRole)
+        word = {"senses": startup.get("dictionary").hydrate(result["id"])}
+
+        if result["reading"]:
+            word["reading"] = result["reading"]
+
+        self.info_widget.clear()
+
+        word_item = QtWidgets.QListWidgetItem(self.info_widget)
+        word_info = WordInfo(word)
+        word_item.setSizeHint(word_info.sizeHint())
+
+        self.info_widget.addItem(word_item)
+        self.info_widget.setItemWidget(word_item, word_info)
+
 
 class Popup(QtWidgets.QWidget):
     def __init__(self, bbox: list[int, int, int, int], text: str, parent: QtWidgets.QWidget):
         super().__init__(parent)
 
         self.text = text
+        self.lookup: tuple[str, list[dict]] | None = None # (text, result) from the prefetcher
         layout = QtWidgets.QHBoxLayout()
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(0)
@@ -337,7 +454,9 @@ class Popup(QtWidgets.QWidget):
         tts(self.text)
 
     def dictionary(self):
-        dictionary = Dictionary(self, self.text)
+        # the prefetched result is stale if the text was edited since
+        words = self.lookup[1] if self.lookup and self.lookup[0] == self.text else None
+        dictionary = Dictionary(self, self.text, words)
 
         dictionary.exec()
 
@@ -351,11 +470,13 @@ class Overlay(QtWidgets.QWidget):
     def __init__(self, bbox):
         super().__init__()
 
-        #self.yolo_model = YOLOv10("models/yolo/yolov10l.pt")
-        #self.ocr_model = MangaOcr()
         self.popups: list[Popup] = []
         self.bbox = bbox
         self.previous_ss = None
+        self.page = 0
+
+        # the prefetcher is only there once the dictionary is loaded
+        startup.when_ready("dictionary", lambda _: prefetcher.prefetched.connect(self.attach_lookup))
 
         self.setAttribute(QtCore.Qt.WidgetAttribute.WA_TranslucentBackground, True)
         self.setWindowFlags(QtCore.Qt.WindowType.FramelessWindowHint | QtCore.Qt.WindowType.WindowStaysOnTopHint)
@@ -371,11 +492,16 @@ class Overlay(QtWidgets.QWidget):
     def scan_screen(self):
         # rename this function & make it run in separate thread
         # change to more universal ss method later
+        if not startup.is_ready("models"): # scan once yolo and ocr are loaded
+            startup.when_ready("models", lambda _: self.scan_screen())
+            return
+
+        yolo_model, ocr_model = startup.get("models")
         ss = screenshot(self.bbox)
 
         self.previous_ss = ss
 
-        bboxes = self.yolo_model(
+        bboxes = yolo_model(
             source=ss,
             conf=0.3,
             classes=[0, 1],
@@ -397,15 +523,24 @@ class Overlay(QtWidgets.QWidget):
             y1 = y - h / 2
             x2, y2 = x1 + w, y1 + h
             bbox_image = ss.crop((x1, y1, x2, y2))
-            text = self.ocr_model(bbox_image)
+            text = ocr_model(bbox_image)
             self.popups.append(Popup(
                 (x1, y1, x2, y2),
                 text,
                 self
             ))
 
+        self.page += 1
+
+        if prefetcher is not None: # otherwise the dictionary looks the text up when it's opened
+            prefetcher.prefetch(self.page, [popup.text for popup in self.popups])
+
         app.processEvents()
 
+    def attach_lookup(self, page: int, index: int, text: str, words: list[dict]):
+        if page == self.page and index < len(self.popups): # popups of older pages are already gone
+            self.popups[index].lookup = (text, words)
+
 
 class MainWindow(QtWidgets.QWidget): # no need for actual main window widget (?)
     def __init__(self):
@@ -449,10 +584,51 @@ class MainWindow(QtWidgets.QWidget): # no need for actual main window widget (?)
             self.overlay.scan_screen()
 
 
+def dictionary_ready(jmdict):
+    global prefetcher, gloss_searcher
+
+    prefetcher = LookupPrefetcher(jmdict, **LOOKUP_OPTIONS)
+    prefetcher.start()
+    app.aboutToQuit.connect(prefetcher.stop) # before the cache closes, the prefetcher may still be writing to it
+
+    gloss_searcher = GlossSearcher(jmdict)
+    gloss_searcher.start()
+    app.aboutToQuit.connect(gloss_searcher.stop)
+    app.aboutToQuit.connect(jmdict.result_cache.close)
+
+
+def startup_finished():
+    profile.mark("everything loaded")
+    profile.report()
+
+
 if __name__ == "__main__":
-    jmdict = JMDict("jmdict.db", "jmnedict.db")
+    parser = ArgumentParser(description="MangaSeer overlay.")
+    parser.add_argument(
+        "--startup-profile", action="store_true",
+        help="print how long importing and loading each component took, and how much memory it added"
+    )
+    args = parser.parse_args()
+
+    profile = StartupProfile(args.startup_profile, started)
+    profile.mark("imports")
+
+    with profile.measure("QApplication"):
+        app = QtWidgets.QApplication()
 
-    app = QtWidgets.QApplication()
+    prefetcher = None
+    gloss_searcher = None
+    startup = Startup(profile)
+    startup.add("dictionary", load_dictionary)
+    startup.add("tokenizer", load_tokenizer)
+    startup.add("models", load_models)
+    startup.when_ready("dictionary", dictionary_ready)
+    startup.failed.connect(lambda name, error: print(f"{name} failed to load: {error}"))
+
+    if args.startup_profile:
+        startup.finished.connect(startup_finished)
+
+    startup.start()
 
     QtGui.QFontDatabase.addApplicationFont("fonts/NotoSansJP.ttf")
     font = QtGui.QFont("Noto Sans JP")
@@ -469,4 +645,6 @@ if __name__ == "__main__":
     #listener.trigger_function.connect(window.on_shortcut_triggered)
     #listener.start()
 
+    QtCore.QTimer.singleShot(0, lambda: profile.mark("window shown")) # first pass of the event loop
+
     app.exec()
@@ -0,0 +1,289 @@
+import os
+import sys
+import sqlite3
+import platform
+import tracemalloc
+import ujson
+from argparse import ArgumentParser
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from utils.tokenizer import SudachiTokenizer, get_tokenizer
+
+try:
+    from utils.dictionary import JMDict, generate_jmdict_sqlite, generate_jmnedict_sqlite
+except FileNotFoundError as e: # tags and kanji, see compile_resources.py
+    sys.exit(f"can't load the dictionary resources: {e}")
+
+try:
+    import resource
+except ImportError: # windows
+    resource = None
+
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark")
+
+# metric -> whether higher is better, for --baseline
+METRICS = {
+    "sentences_per_second": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "queries_per_sentence": False,
+    "peak_kib": False
+}
+
+# a cold pass sees every sentence once, its tail percentiles are a handful of samples and too noisy to gate on
+COLD_GATED = ("sentences_per_second", "p50_ms", "queries_per_sentence", "peak_kib")
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+
+def load_corpus(path: str) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def run_pass(jmdict: JMDict, sentences: list[str], options: dict) -> list[float]:
+    """Looks every sentence up the way a popup does (tokens, then the senses of every word), returns seconds per sentence"""
+    latencies = []
+
+    for sentence in sentences:
+        start = perf_counter()
+        tokens = jmdict.lookup(sentence, **options)
+        jmdict.hydrate_many([word for token in tokens if token["type"] for word in token["words"]])
+        latencies.append(perf_counter() - start)
+
+    return latencies
+
+
+def summarize(latencies: list[float], query_stats: dict) -> dict:
+    ordered = sorted(latencies)
+    total = sum(latencies)
+
+    return {
+        "sentences": len(latencies),
+        "seconds": total,
+        "sentences_per_second": len(latencies) / total if total else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+        "queries": query_stats["queries"],
+        "queries_per_sentence": query_stats["queries"] / len(latencies) if latencies else 0.0,
+        "rows": query_stats["rows"],
+        "sql_ms": query_stats["total_ms"],
+        "statements": {sql: statement["calls"] for sql, statement in query_stats["statements"].items()}
+    }
+
+
+def median_summary(summaries: list[dict]) -> dict:
+    """Median of every number over several summaries of the same corpus, the rest is taken from the first"""
+    return {
+        key: median(summary[key] for summary in summaries) if isinstance(value, (int, float)) else value
+        for key, value in summaries[0].items()
+    }
+
+
+def fresh_dictionary(jmdict_path: str, jmnedict_path: str, options: dict) -> tuple[JMDict, float]:
+    """A JMDict with empty caches and the tokenizer's sentence cache cleared, returns it and its init time in seconds
+
+    The trie is built before returning in trie mode, otherwise it'd count as the first sentence's latency.
+    """
+    start = perf_counter()
+    jmdict = JMDict(jmdict_path, jmnedict_path, query_stats=True)
+    init_seconds = perf_counter() - start
+
+    jmdict.tokenizer.cache.clear()
+
+    if options["mode"] == "trie":
+        jmdict.trie
+
+    return jmdict, init_seconds
+
+
+def peak_memory(jmdict_path: str, jmnedict_path: str, sentences: list[str], options: dict, rounds: int) -> dict:
+    """Python heap peaks of a cold and a warm pass, measured separately since tracing slows everything down"""
+    # a tokenizer of its own, the shared one already has every sentence cached. loaded before tracing starts,
+    # like the timed passes
+    tokenizer = SudachiTokenizer()
+
+    if options["mode"] == "sudachi":
+        tokenizer.load()
+
+    tracemalloc.start()
+    jmdict = JMDict(jmdict_path, jmnedict_path, tokenizer=tokenizer)
+    loaded = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+
+    run_pass(jmdict, sentences, options)
+    cold = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+
+    for _ in range(rounds):
+        run_pass(jmdict, sentences, options)
+
+    warm = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"init": loaded / 1024, "cold": cold / 1024, "warm": warm / 1024}
+
+
+def benchmark(jmdict_path: str, jmnedict_path: str, sentences: list[str], options: dict, rounds: int, cold_rounds: int) -> dict:
+    # the sudachi dictionary loads on first use, that would be counted as the first sentence's latency. it's shared
+    # by every JMDict instance, so it's only loaded once
+    start = perf_counter()
+
+    if options["mode"] == "sudachi":
+        get_tokenizer().load()
+
+    tokenizer_seconds = perf_counter() - start
+
+    # cold: fresh caches and connections, every sentence seen for the first time. one pass is too few samples,
+    # so it's repeated with new instances and the medians are kept
+    summaries, init_times = [], []
+
+    for _ in range(cold_rounds):
+        jmdict, init_seconds = fresh_dictionary(jmdict_path, jmnedict_path, options)
+        summaries.append(summarize(run_pass(jmdict, sentences, options), jmdict.stats()))
+        init_times.append(init_seconds)
+
+    cold = median_summary(summaries)
+
+    # warm: the same sentences again, token results now come from the cache
+    jmdict.reset_stats()
+    latencies = []
+
+    for _ in range(rounds):
+        latencies.extend(run_pass(jmdict, sentences, options))
+
+    warm = summarize(latencies, jmdict.stats())
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None # before a second tokenizer loads
+    memory = peak_memory(jmdict_path, jmnedict_path, sentences, options, rounds)
+    cold["peak_kib"] = memory["cold"]
+    warm["peak_kib"] = memory["warm"]
+
+    return {
+        "init_ms": median(init_times) * 1000,
+        "tokenizer_ms": tokenizer_seconds * 1000,
+        "init_kib": memory["init"],
+        "cold": cold,
+        "warm": warm,
+        "max_rss_kib": max_rss,
+        "cache": jmdict.cache_stats()
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Prints every metric next to the baseline, returns the ones that got worse by more than `threshold`"""
+    regressions = []
+
+    for phase in ("cold", "warm"):
+        for metric, higher_is_better in METRICS.items():
+            old, new = baseline.get(phase, {}).get(metric), results[phase][metric]
+
+            if not old:
+                continue
+
+            change = new / old - 1
+            worse = -change if higher_is_better else change
+            flag = ""
+
+            if worse > threshold and (phase == "warm" or metric in COLD_GATED):
+                regressions.append(f"{phase} {metric}")
+                flag = "  <- regression"
+
+            print(f"{phase:>5} {metric:>21}: {old:10.2f} -> {new:10.2f} ({change:+7.1%}){flag}")
+
+    new_statements = set(results["warm"]["statements"]) | set(results["cold"]["statements"])
+    old_statements = set(baseline.get("warm", {}).get("statements", {})) | set(baseline.get("cold", {}).get("statements", {}))
+
+    for sql in sorted(new_statements - old_statements):
+        print(f"new statement: {sql}")
+
+    return regressions
+
+
+def report(results: dict):
+    print(f"init: {results['init_ms']:.0f} ms, {results['init_kib']:.0f} KiB, sudachi dictionary: {results['tokenizer_ms']:.0f} ms")
+
+    for phase in ("cold", "warm"):
+        stats = results[phase]
+        print(
+            f"{phase:>5}: {stats['sentences_per_second']:8.1f} sentences/s, "
+            f"p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms, "
+            f"{stats['queries_per_sentence']:.2f} queries/sentence, peak {stats['peak_kib']:.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmarks JMDict.lookup over a fixed corpus of manga sentences.")
+    parser.add_argument("--corpus", default=os.path.join(BENCHMARK_DIR, "corpus.txt"), help="text file with one sentence per line")
+    parser.add_argument("--jmdict", default=None, help="jmdict database, defaults to one built from the test dictionary")
+    parser.add_argument("--jmnedict", default=None, help="jmnedict database, defaults to one built from the test dictionary")
+    parser.add_argument("--rounds", type=int, default=5, help="warm passes over the corpus")
+    parser.add_argument("--cold-rounds", type=int, default=5, help="cold passes, each with a new JMDict, the medians are reported")
+    parser.add_argument("--mode", default="sudachi", choices=("sudachi", "trie"))
+    parser.add_argument("--all-words", action="store_true", help="include uncommon words (lookup common=False)")
+    parser.add_argument("--fuzzy", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write the results to this json file")
+    parser.add_argument("--baseline", default=None, help="results json of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    if args.cold_rounds < 1:
+        parser.error("--cold-rounds has to be at least 1")
+
+    if bool(args.jmdict) != bool(args.jmnedict):
+        parser.error("pass both --jmdict and --jmnedict, or neither for the test dictionary")
+
+    sentences = load_corpus(args.corpus)
+    options = {"common": not args.all_words, "mode": args.mode, "fuzzy": args.fuzzy}
+
+    with TemporaryDirectory() as build_dir:
+        jmdict_path, jmnedict_path = args.jmdict, args.jmnedict
+
+        if not jmdict_path:
+            jmdict_path = os.path.join(build_dir, "jmdict.db")
+            jmnedict_path = os.path.join(build_dir, "jmnedict.db")
+            generate_jmdict_sqlite(os.path.join(BENCHMARK_DIR, "jmdict-test.json"), jmdict_path)
+            generate_jmnedict_sqlite(os.path.join(BENCHMARK_DIR, "jmnedict-test.json"), jmnedict_path)
+
+        results = benchmark(jmdict_path, jmnedict_path, sentences, options, args.rounds, args.cold_rounds)
+
+    results["environment"] = {
+        "python": sys.version.split()[0],
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "corpus": os.path.basename(args.corpus),
+        "sentences": len(sentences),
+        "dictionary": "test" if not args.jmdict else os.path.basename(args.jmdict),
+        "options": options,
+        "rounds": args.rounds,
+        "cold_rounds": args.cold_rounds
+    }
+
+    report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            ujson.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = ujson.load(f)
+
+        if baseline.get("environment", {}).get("options") != options:
+            print("warning: the baseline was run with different lookup options")
+
+        regressions = compare(results, baseline, args.threshold)
+
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,57 @@
+import ujson
+from argparse import ArgumentParser
+from time import perf_counter
+from utils.dictionary import JMDict
+
+
+def coverage(tokens: list[dict]) -> tuple[int, int]:
+    """Returns (characters inside found words, characters that could have been found)"""
+    found = sum(len(token["text"]) for token in tokens if token["type"])
+    total = sum(1 for token in tokens for c in token["text"] if c.isalpha())
+
+    return found, total
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Compares sudachi and trie lookup modes for throughput and coverage.")
+    parser.add_argument("corpus", help="text file with one sentence per line")
+    parser.add_argument("--jmdict", default="jmdict.db")
+    parser.add_argument("--jmnedict", default="jmnedict.db")
+    parser.add_argument("--trie", default=None, help="headword file made by compile_dictionary.py")
+    parser.add_argument("--query-stats", default=None, metavar="JSON", help="record sqlite queries per mode into this file")
+    args = parser.parse_args()
+
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        sentences = [line.strip() for line in f if line.strip()]
+
+    jmdict = JMDict(args.jmdict, args.jmnedict, cache_size=0, trie_path=args.trie, query_stats=bool(args.query_stats))
+    # load both up front so neither is timed
+    jmdict.tokenizer.load()
+    jmdict.trie
+    query_stats = {}
+
+    for mode in ("sudachi", "trie"):
+        jmdict.reset_stats()
+        found = total = 0
+        start = perf_counter()
+
+        for sentence in sentences:
+            tokens = jmdict.lookup(sentence, common=False, mode=mode)
+            sentence_found, sentence_total = coverage(tokens)
+            found += sentence_found
+            total += sentence_total
+
+        elapsed = perf_counter() - start
+
+        print(
+            f"{mode:>8}: {len(sentences) / elapsed:8.1f} sentences/s, "
+            f"{found / total if total else 0:6.1%} of characters covered by dictionary words"
+        )
+
+        if args.query_stats:
+            query_stats[mode] = jmdict.stats()
+            print(f"{'':>8}  {query_stats[mode]['queries'] / len(sentences):8.2f} queries per sentence")
+
+    if args.query_stats:
+        with open(args.query_stats, "w", encoding="utf-8") as f:
+            ujson.dump(query_stats, f, ensure_ascii=False, indent=2)
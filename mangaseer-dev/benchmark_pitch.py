@@ -0,0 +1,93 @@
+import os
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from utils.pitch_accent import (
+    PitchAccents, MORA_SEPARATOR, accent_rows, decode_pattern, generate_accents_json, generate_accents_sqlite,
+    pitch_masks, read_accents, split_morae
+)
+
+
+def time_words(accents: PitchAccents, words: list[str], rounds: int) -> float:
+    """Best seconds per `get_pitch` call over every word, out of `rounds` passes"""
+    best = None
+
+    for _ in range(rounds):
+        start = perf_counter()
+
+        for word in words:
+            accents.get_pitch(word)
+
+        elapsed = (perf_counter() - start) / len(words)
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def time_patterns(accents: list[tuple[str, str, str]], rounds: int) -> tuple[float, float]:
+    """Best seconds per accents.txt line of only the pattern work, (worked out, decoded from stored rows)"""
+    stored = [(morae, mask) for _, _, _, morae, mask in accent_rows(accents)]
+    computed = decoded = None
+
+    for _ in range(rounds):
+        start = perf_counter()
+
+        for _, reading, pitch in accents:
+            morae = split_morae(reading)
+
+            for mask in pitch_masks(len(morae), pitch):
+                decode_pattern(morae, mask)
+
+        elapsed = (perf_counter() - start) / len(accents)
+        computed = elapsed if computed is None else min(computed, elapsed)
+
+        start = perf_counter()
+
+        for morae, mask in stored:
+            decode_pattern(morae.split(MORA_SEPARATOR), mask)
+
+        elapsed = (perf_counter() - start) / len(accents)
+        decoded = elapsed if decoded is None else min(decoded, elapsed)
+
+    return computed, decoded
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Times get_pitch over every word in accents.txt, worked out per call vs precompiled.")
+    parser.add_argument("accents", nargs="?", default="accents.txt", help="tab separated word, reading and accents")
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the words, the fastest one counts")
+    args = parser.parse_args()
+
+    accents = list(read_accents(args.accents))
+    words = list(dict.fromkeys(word for word, _, _ in accents))
+    print(f"{len(words)} words, {len(accents)} readings")
+
+    computed, decoded = time_patterns(accents, args.rounds)
+    print(f"patterns only: {computed * 1e6:.2f} µs/reading worked out, {decoded * 1e6:.2f} µs/reading decoded")
+
+    with TemporaryDirectory() as build_dir:
+        json_path = os.path.join(build_dir, "readings.json")
+        db_path = os.path.join(build_dir, "readings.db")
+
+        start = perf_counter()
+        generate_accents_json(args.accents, json_path)
+        print(f"built readings.json in {perf_counter() - start:.2f} s")
+
+        start = perf_counter()
+        generate_accents_sqlite(args.accents, db_path)
+        print(f"built readings.db in {perf_counter() - start:.2f} s")
+
+        # readings.json only has the raw accents, so every call splits morae and works out the patterns again
+        for name, path in (("per call (readings.json)", json_path), ("precompiled (readings.db)", db_path)):
+            accents = PitchAccents(path, cache_size=0)
+            accents.get_pitch(words[0]) # load the json / open the connection outside the timing
+
+            uncached = time_words(accents, words, args.rounds)
+            accents.close()
+
+            accents = PitchAccents(path, cache_size=len(words))
+            time_words(accents, words, 1)
+            cached = time_words(accents, words, args.rounds)
+            accents.close()
+
+            print(f"{name:>26}: {uncached * 1e6:6.2f} µs/word uncached, {cached * 1e6:5.2f} µs/word cached")
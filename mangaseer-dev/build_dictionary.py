@@ -0,0 +1,89 @@
+import os
+import sqlite3
+from argparse import ArgumentParser
+from time import perf_counter
+from utils.dictionary import JMDict, generate_jmdict_sqlite, generate_jmnedict_sqlite
+
+
+SAMPLE_SENTENCES = [
+    "雛人形の顔を作ると頭師”になる事",
+    "今日は天気がいいから散歩に行こう",
+    "俺はまだ諦めてないぞ！",
+    "この本を読んだことがありますか？",
+    "彼女は先生に褒められて嬉しそうだった"
+]
+
+
+def database_stats(path: str) -> dict:
+    connection = sqlite3.connect(path)
+    stats = {"size": os.path.getsize(path)}
+
+    for table in ("kanji", "kana", "senses", "glossary", "translations"):
+        try:
+            stats[table] = connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        except sqlite3.OperationalError: # jmdict has no translations, jmnedict no senses / glossary
+            pass
+
+    connection.close()
+
+    return stats
+
+
+def lookup_speed(jmdict_path: str, jmnedict_path: str, sentences: list[str], rounds: int = 5) -> float:
+    """Uncached lookups per second over the sentences"""
+    jmdict = JMDict(jmdict_path, jmnedict_path, cache_size=0)
+    jmdict.lookup_many(sentences, common=True) # warm up the tokenizer and page cache
+    start = perf_counter()
+
+    for _ in range(rounds):
+        for sentence in sentences:
+            jmdict.hydrate_many([word for token in jmdict.lookup(sentence, common=True) if token["type"] for word in token["words"]])
+
+    return rounds * len(sentences) / (perf_counter() - start)
+
+
+def report(paths: tuple[str, str], compare: tuple[str, str] | None, sentences: list[str]):
+    for i, label in enumerate(("jmdict", "jmnedict")):
+        stats = database_stats(paths[i])
+        line = f"{label}: {stats['size'] / 1024 / 1024:.1f} MiB, " + ", ".join(
+            f"{count} {table}" for table, count in stats.items() if table != "size"
+        )
+
+        if compare:
+            full_stats = database_stats(compare[i])
+            line += f" ({stats['size'] / full_stats['size']:.0%} the size of {compare[i]})"
+
+        print(line)
+
+    speed = lookup_speed(*paths, sentences)
+    line = f"lookups: {speed:.1f} sentences/s"
+
+    if compare:
+        full_speed = lookup_speed(*compare, sentences)
+        line += f" ({full_speed:.1f} sentences/s with the full databases, {speed / full_speed:.2f}x)"
+
+    print(line)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Builds the dictionary databases, optionally pruned to fewer languages / common words.")
+    parser.add_argument("jmdict_json", help="jmdict-simplified json release")
+    parser.add_argument("jmnedict_json", help="jmnedict json release")
+    parser.add_argument("--jmdict-out", default="jmdict.db")
+    parser.add_argument("--jmnedict-out", default="jmnedict.db")
+    parser.add_argument("--languages", nargs="+", default=None, help="gloss languages to keep, e.g. eng ger")
+    parser.add_argument("--common-only", action="store_true", help="only keep common words")
+    parser.add_argument("--compare", nargs=2, default=None, metavar=("JMDICT", "JMNEDICT"), help="full databases to report against")
+    parser.add_argument("--corpus", default=None, help="text file with one sentence per line to time lookups with")
+    args = parser.parse_args()
+
+    generate_jmdict_sqlite(args.jmdict_json, args.jmdict_out, languages=args.languages, common_only=args.common_only)
+    generate_jmnedict_sqlite(args.jmnedict_json, args.jmnedict_out, languages=args.languages)
+
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            sentences = [line.strip() for line in f if line.strip()]
+    else:
+        sentences = SAMPLE_SENTENCES
+
+    report((args.jmdict_out, args.jmnedict_out), args.compare, sentences)
@@ -0,0 +1,20 @@
+from argparse import ArgumentParser
+from utils.dictionary import compile_dictionary
+from utils.headword_trie import build_headword_trie
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Compiles dictionary databases into mmap'd files for JMDict(backend=\"compiled\").")
+    parser.add_argument("--jmdict", default="jmdict.db")
+    parser.add_argument("--jmnedict", default="jmnedict.db")
+    parser.add_argument("--jmdict-out", default="jmdict.bin")
+    parser.add_argument("--jmnedict-out", default="jmnedict.bin")
+    parser.add_argument("--trie-out", default="headwords.txt", help="headword file for JMDict.lookup(mode=\"trie\")")
+    args = parser.parse_args()
+
+    for db_path, out_path in ((args.jmdict, args.jmdict_out), (args.jmnedict, args.jmnedict_out)):
+        count = compile_dictionary(db_path, out_path)
+        print(f"{db_path} -> {out_path}: {count} headwords")
+
+    count = build_headword_trie(args.trie_out, args.jmdict, args.jmnedict)
+    print(f"{args.trie_out}: {count} headwords")
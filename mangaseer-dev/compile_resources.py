@@ -0,0 +1,13 @@
+import os
+from argparse import ArgumentParser
+from utils.resource_pack import compile_resources, RESOURCE_PACK_PATH, ROOT
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Bundles the tag tables, part of speech map and kanji list into resources.pack.")
+    parser.add_argument("--output", default=RESOURCE_PACK_PATH)
+    parser.add_argument("--root", default=ROOT, help="directory with jmdict_tags.json, jmnedict_tags.json, pos_tags.json and kanji.txt")
+    args = parser.parse_args()
+
+    counts = compile_resources(args.output, args.root)
+    print(f"{args.output}: {', '.join(f'{count} {name}' for name, count in counts.items())}, {os.path.getsize(args.output)} bytes")
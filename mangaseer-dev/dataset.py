@@ -4,8 +4,9 @@ from multiprocessing.pool import ThreadPool
 import ujson
 from tqdm import tqdm
 from pykakasi import kakasi
-from sudachipy import tokenizer, dictionary
 from utils import Renderer
+from utils.tokenizer import get_tokenizer
+from utils.resource_pack import get_resources
 
 
 def get_conv_dataset() -> set:
@@ -20,11 +21,8 @@ def get_conv_dataset() -> set:
     return conv_dataset
 
 
-def get_kanji() -> set:
-    with open("manga_datasets/japanese/kanji.txt", "r", encoding="utf-8") as f:
-        kanji_list = f.readlines()
-
-    return set(kanji.strip() for kanji in kanji_list)
+def get_kanji() -> frozenset[str]:
+    return get_resources().kanji
 
 
 def preprocess_sentence(sentence: str):
@@ -66,7 +64,7 @@ def needs_furigana(text: str) -> bool:
     return bool(len(kanji_set.intersection(set(text)))) # currently just checks whether there's kanji in the string or not
 
 
-sudachi_dict = dictionary.Dictionary(dict="full").create()
+sudachi = get_tokenizer()
 kks = kakasi()
 kanji_set = get_kanji()
 
@@ -84,7 +82,7 @@ def furigana(text: str, random=False) -> tuple[str, str]:
     raw = ""
     html = "<p>"
 
-    for token in sudachi_dict.tokenize(text, tokenizer.Tokenizer.SplitMode.A): # erm should probs make sure this split mode is optimal
+    for token in sudachi.tokenize(text, "A"): # erm should probs make sure this split mode is optimal
         token = token.normalized_form()
 
         if random:
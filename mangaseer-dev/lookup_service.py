@@ -0,0 +1,28 @@
+from argparse import ArgumentParser
+from utils.dictionary import JMDict
+from utils.lookup_service import LookupService, DEFAULT_ADDRESS
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Serves dictionary lookups to other local processes (see utils.lookup_service.LookupClient).")
+    parser.add_argument("--jmdict", default="jmdict.db")
+    parser.add_argument("--jmnedict", default="jmnedict.db")
+    parser.add_argument("--host", default=DEFAULT_ADDRESS[0], help="keep this on localhost, there's no authentication")
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1])
+    parser.add_argument("--result-cache", default=None, help="file to persist whole lookup results in")
+    parser.add_argument("--query-stats", action="store_true", help="record sqlite queries, clients can read them with stats()")
+    args = parser.parse_args()
+
+    jmdict = JMDict(args.jmdict, args.jmnedict, result_cache_path=args.result_cache, query_stats=args.query_stats)
+    service = LookupService(jmdict, (args.host, args.port))
+    print(f"serving {args.jmdict} and {args.jmnedict} on {args.host}:{args.port}")
+
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.server_close()
+
+        if jmdict.result_cache is not None:
+            jmdict.result_cache.close()
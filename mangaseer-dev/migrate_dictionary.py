@@ -0,0 +1,25 @@
+from argparse import ArgumentParser
+from utils.dictionary import SCHEMA_VERSION, migrate_database, check_entries
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Upgrades existing dictionary databases to the current schema without rebuilding them.")
+    parser.add_argument("paths", nargs="*", default=["jmdict.db", "jmnedict.db"])
+    parser.add_argument("--check", action="store_true", help="verify the entries table against the normalized tables")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        old_version, version = migrate_database(path)
+
+        if old_version == version:
+            print(f"{path}: already at schema version {version}")
+        else:
+            print(f"{path}: migrated from schema version {old_version} to {version} (latest is {SCHEMA_VERSION})")
+
+        if args.check:
+            mismatched = check_entries(path)
+
+            if mismatched:
+                print(f"{path}: {len(mismatched)} inconsistent entries, e.g. word ids {mismatched[:10]}")
+            else:
+                print(f"{path}: entries are consistent")
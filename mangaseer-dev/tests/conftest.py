@@ -0,0 +1,6 @@
+import os
+import sys
+
+
+# the tests import utils the same way the scripts do, from the project directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
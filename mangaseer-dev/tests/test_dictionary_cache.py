@@ -0,0 +1,39 @@
+import os
+import pytest
+
+for module in ("ujson", "xxhash", "sudachipy"):
+    pytest.importorskip(module)
+
+from utils.cache import deep_sizeof
+from utils.dictionary import JMDict, generate_jmdict_sqlite, generate_jmnedict_sqlite
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark")
+
+
+@pytest.fixture(scope="module")
+def databases(tmp_path_factory) -> tuple[str, str]:
+    build_dir = tmp_path_factory.mktemp("dictionary")
+    jmdict_path, jmnedict_path = str(build_dir / "jmdict.db"), str(build_dir / "jmnedict.db")
+    generate_jmdict_sqlite(os.path.join(BENCHMARK_DIR, "jmdict-test.json"), jmdict_path)
+    generate_jmnedict_sqlite(os.path.join(BENCHMARK_DIR, "jmnedict-test.json"), jmnedict_path)
+
+    return jmdict_path, jmnedict_path
+
+
+def test_cache_stays_within_its_size_after_hydration(databases):
+    with open(os.path.join(BENCHMARK_DIR, "corpus.txt"), "r", encoding="utf-8") as f:
+        sentences = [line.strip() for line in f if line.strip()]
+
+    max_bytes = 16 * 1024
+    jmdict = JMDict(*databases, cache_bytes=max_bytes)
+
+    # trie mode, so the test doesn't need the sudachi dictionary
+    for result in jmdict.lookup_many(sentences, common=False, mode="trie"):
+        words = [word for token in result if token["type"] for word in token["words"]]
+        jmdict.hydrate_many(words)
+
+        assert all(word.hydrated for word in words)
+
+    for cache in (jmdict.cache, jmdict.lazy_cache):
+        assert cache.bytes == sum(deep_sizeof(value) for value in cache._entries.values())
+        assert cache.bytes <= max_bytes
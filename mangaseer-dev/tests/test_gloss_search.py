@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("PySide6")
+
+from utils.gloss_search import GlossSearcher
+
+
+class TypingDictionary:
+    def __init__(self):
+        self.searcher: GlossSearcher | None = None
+        self.searched = []
+
+    def search_gloss(self, query: str, limit: int = 20) -> list[dict]:
+        self.searched.append(query)
+
+        if query == "t":
+            # the user keeps typing while the first query runs
+            for text in ("to", "to e", "to ea"):
+                self.searcher.search(text)
+        elif query == "bad":
+            raise RuntimeError("database is being replaced")
+
+        return [{"gloss": query}]
+
+
+def test_only_newest_query_is_searched():
+    jmdict = TypingDictionary()
+    searcher = jmdict.searcher = GlossSearcher(jmdict)
+    found = []
+
+    searcher.found.connect(lambda request, query, results: found.append((request, query, results)))
+    searcher.found.connect(lambda *_: searcher.queries.put((None, None))) # stops after the first answer
+
+    searcher.search("t")
+    searcher.search("bad")
+    searcher.run() # in this thread, so the signals are delivered directly
+
+    # "t" was stale as soon as "bad" came in, a failed query still answers its request
+    assert jmdict.searched == ["bad"]
+    assert found == [(2, "bad", [])]
+
+
+def test_queries_typed_during_a_search_collapse():
+    jmdict = TypingDictionary()
+    searcher = jmdict.searcher = GlossSearcher(jmdict)
+    found = []
+
+    searcher.found.connect(lambda request, query, results: found.append((request, query)))
+    searcher.found.connect(lambda *_: searcher.queries.empty() and searcher.queries.put((None, None)))
+
+    searcher.search("t")
+    searcher.run()
+
+    assert jmdict.searched == ["t", "to ea"]
+    assert found == [(1, "t"), (4, "to ea")]
@@ -0,0 +1,21 @@
+from utils.headword_trie import HeadwordTrie
+
+
+def test_bare_endings_are_not_deinflected():
+    trie = HeadwordTrie(["い", "る"])
+
+    assert trie.segment("くさそうたて") == [("くさそうたて", None)]
+    assert trie.longest_match("て") is None
+
+    trie = HeadwordTrie(["い", "る", "くさい"])
+
+    assert trie.segment("くさそうたて") == [("くさそう", "くさい"), ("たて", None)]
+
+
+def test_irregular_verbs_are_deinflected_without_a_stem():
+    trie = HeadwordTrie(["する", "くる", "来る", "勉強", "勉強する"])
+
+    assert trie.segment("した") == [("した", "する")]
+    assert trie.segment("きた") == [("きた", "くる")]
+    assert trie.segment("来た") == [("来た", "来る")]
+    assert trie.segment("勉強した") == [("勉強した", "勉強する")]
@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("ujson")
+
+from threading import Thread, current_thread
+from utils.lookup_service import LookupService, LookupClient
+
+
+class ThreadRecordingDictionary:
+    def __init__(self):
+        self.threads = set()
+
+    def lookup_many(self, texts: list[str], common=True, mode: str = "sudachi", fuzzy: int = 0) -> list[list]:
+        self.threads.add(current_thread())
+
+        return [[] for _ in texts]
+
+    def to_plain(self, output: list) -> list[dict]:
+        return output
+
+    def fetch_lazy(self, lazy_key: str, word_ids: set[int]) -> dict:
+        self.threads.add(current_thread())
+
+        return {}
+
+    def search_gloss(self, query: str, limit: int = 20, lang: str = "eng") -> list[dict]:
+        self.threads.add(current_thread())
+
+        return [{"gloss": query}]
+
+    def fuzzy_lookup(self, token: str, max_distance: int = 1, limit: int = 10) -> list[tuple[str, int]]:
+        self.threads.add(current_thread())
+
+        return [(token, 0)]
+
+
+def test_dictionary_is_only_used_from_the_worker_thread():
+    jmdict = ThreadRecordingDictionary()
+    service = LookupService(jmdict, ("127.0.0.1", 0))
+    Thread(target=service.serve_forever, daemon=True).start()
+
+    try:
+        # every client connection is handled by a thread of its own
+        for _ in range(3):
+            client = LookupClient(service.server_address)
+
+            assert client.lookup_many(["猫"]) == [[]]
+            assert client.hydrate(1) == []
+            assert client.search_gloss("cat") == [{"gloss": "cat"}]
+            assert client.fuzzy_lookup("猫") == [("猫", 0)]
+
+            client.close()
+    finally:
+        service.shutdown()
+        service.server_close()
+
+    assert jmdict.threads == {service.batcher}
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("PySide6")
+
+from utils.prefetch import LookupPrefetcher
+
+
+class FailingDictionary:
+    def __init__(self):
+        self.prefetcher: LookupPrefetcher | None = None
+        self.hydrated = []
+
+    def lookup_many(self, texts: list[str], **options) -> list[list[dict]]:
+        if texts == ["bad"]:
+            # the next scan comes in while this page is still being looked up
+            self.prefetcher.prefetch(2, ["good"])
+            raise RuntimeError("database is being replaced")
+
+        return [[{"text": text, "type": None, "words": ()}] for text in texts]
+
+    def hydrate_many(self, words: list):
+        self.hydrated.append(words)
+
+
+def test_failed_page_does_not_stop_prefetching():
+    jmdict = FailingDictionary()
+    prefetcher = jmdict.prefetcher = LookupPrefetcher(jmdict)
+    failed, prefetched = [], []
+
+    prefetcher.failed.connect(lambda page, error: failed.append((page, error)))
+    prefetcher.prefetched.connect(lambda page, i, text, tokens: prefetched.append((page, i, text)))
+    prefetcher.prefetched.connect(lambda *_: prefetcher.pages.put((None, None))) # stops after the good page
+
+    prefetcher.prefetch(1, ["bad"])
+    prefetcher.run() # in this thread, so the signals are delivered directly
+
+    assert failed == [(1, "RuntimeError: database is being replaced")]
+    assert prefetched == [(2, 0, "good")]
+    assert jmdict.hydrated == [[]]
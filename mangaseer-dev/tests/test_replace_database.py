@@ -0,0 +1,66 @@
+import os
+import shutil
+import sqlite3
+import pytest
+
+for module in ("ujson", "xxhash", "sudachipy"):
+    pytest.importorskip(module)
+
+from utils.compiled_dictionary import CompiledDictionary
+from utils.dictionary import (
+    SCHEMA_VERSION, JMDict, compile_dictionary, generate_jmdict_sqlite, generate_jmnedict_sqlite, migrate_database
+)
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark")
+
+
+@pytest.fixture
+def databases(tmp_path) -> tuple[str, str]:
+    jmdict_path, jmnedict_path = str(tmp_path / "jmdict.db"), str(tmp_path / "jmnedict.db")
+    generate_jmdict_sqlite(os.path.join(BENCHMARK_DIR, "jmdict-test.json"), jmdict_path)
+    generate_jmnedict_sqlite(os.path.join(BENCHMARK_DIR, "jmnedict-test.json"), jmnedict_path)
+
+    return jmdict_path, jmnedict_path
+
+
+def test_migrating_leaves_open_databases_readable(databases):
+    jmdict_path, _ = databases
+    jmdict = JMDict(*databases, cache_size=0)
+    sentence = "雛人形の顔を作る"
+    before = jmdict.to_plain(jmdict.lookup(sentence, common=False, mode="trie"))
+    assert any(token["words"] for token in before)
+
+    connection = sqlite3.connect(jmdict_path)
+    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION - 1}")
+    connection.commit()
+    connection.close()
+    inode = os.stat(jmdict_path).st_ino
+
+    assert migrate_database(jmdict_path) == (SCHEMA_VERSION - 1, SCHEMA_VERSION)
+    assert os.stat(jmdict_path).st_ino != inode # swapped in, not rewritten
+    assert not os.path.exists(f"{jmdict_path}.update")
+    assert jmdict.to_plain(jmdict.lookup(sentence, common=False, mode="trie")) == before
+
+    # already current, nothing is copied
+    inode = os.stat(jmdict_path).st_ino
+    assert migrate_database(jmdict_path) == (SCHEMA_VERSION, SCHEMA_VERSION)
+    assert os.stat(jmdict_path).st_ino == inode
+
+
+def test_recompiling_leaves_open_compiled_dictionaries_readable(databases, tmp_path):
+    jmdict_path, _ = databases
+    out_path = str(tmp_path / "jmdict.compiled")
+    compile_dictionary(jmdict_path, out_path)
+
+    compiled = CompiledDictionary(out_path)
+    keys = [("kanji", "顔"), ("kana", "かお")]
+    before = [compiled.get(table, surface) for table, surface in keys]
+    inode = os.stat(out_path).st_ino
+    assert all(before)
+
+    shutil.copyfile(jmdict_path, str(tmp_path / "other.db"))
+    compile_dictionary(str(tmp_path / "other.db"), out_path)
+
+    assert os.stat(out_path).st_ino != inode # the mapped file wasn't truncated
+    assert [compiled.get(table, surface) for table, surface in keys] == before
+    assert not os.path.exists(f"{out_path}.new")
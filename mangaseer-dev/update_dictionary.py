@@ -0,0 +1,20 @@
+from argparse import ArgumentParser
+from utils.dictionary import update_dictionary
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Updates existing dictionary databases from newer json releases, only rewriting changed entries.")
+    parser.add_argument("--jmdict", default=None, help="new jmdict-simplified json release")
+    parser.add_argument("--jmnedict", default=None, help="new jmnedict json release")
+    parser.add_argument("--jmdict-db", default="jmdict.db")
+    parser.add_argument("--jmnedict-db", default="jmnedict.db")
+    args = parser.parse_args()
+
+    if not args.jmdict and not args.jmnedict:
+        parser.error("nothing to update, pass --jmdict and/or --jmnedict")
+
+    for path, db_path in ((args.jmdict, args.jmdict_db), (args.jmnedict, args.jmnedict_db)):
+        if path:
+            update_dictionary(path, db_path)
+
+    print("recompile with compile_dictionary.py if you use the compiled backend or a prebuilt headword file")
@@ -1,6 +1,26 @@
-from utils.ss import screenshot
-from utils.html_render import Renderer
-from utils.text_to_speech import tts
-from utils.dictionary import JMDict
-from utils.hotkey import KeyboardListener
-from utils.pitch_accent import get_pitch
+from importlib import import_module
+
+
+# imported on first use, so e.g. `from utils import get_pitch` doesn't load the dictionary, tts and screenshot modules
+_exports = {
+    "screenshot": "utils.ss",
+    "Renderer": "utils.html_render",
+    "tts": "utils.text_to_speech",
+    "JMDict": "utils.dictionary",
+    "KeyboardListener": "utils.hotkey",
+    "LookupPrefetcher": "utils.prefetch",
+    "GlossSearcher": "utils.gloss_search",
+    "get_pitch": "utils.pitch_accent"
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name: str):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(_exports[name]), name)
+    globals()[name] = value
+
+    return value
@@ -0,0 +1,261 @@
+import sys
+import sqlite3
+import ujson
+import xxhash
+from collections import OrderedDict
+from threading import Lock
+from time import time
+from utils.records import Record
+
+
+MISSING = object()
+
+
+def deep_sizeof(obj, seen: set = None) -> int:
+    """Roughly estimates the memory used by an object and everything it contains
+
+    Args:
+        obj: The object to measure.
+        seen (set, optional): Ids of objects already counted. Defaults to None.
+
+    Returns:
+        int: Estimated size in bytes.
+    """
+    if seen is None:
+        seen = set()
+
+    if id(obj) in seen:
+        return 0
+
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif isinstance(obj, Record): # only what's loaded, measuring shouldn't hydrate lazy words
+        size += sum(deep_sizeof(object.__getattribute__(obj, key), seen) for key in obj.fields if Record._is_set(obj, key))
+
+    return size
+
+
+class LRUCache:
+    def __init__(self, max_entries: int = 50000, max_bytes: int | None = None):
+        """Thread-safe least recently used cache bounded by entry count and (optionally) estimated memory
+
+        Args:
+            max_entries (int, optional): Maximum number of entries. Defaults to 50000.
+            max_bytes (int | None, optional): Maximum estimated size of all values in bytes. Defaults to None (no limit).
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries: OrderedDict = OrderedDict()
+        self._sizes: dict = {}
+        self._lock = Lock()
+
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            value = self._entries.get(key, MISSING)
+
+            if value is MISSING:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def put(self, key, value):
+        size = deep_sizeof(value) if self.max_bytes is not None else 0
+
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._sizes.pop(key)
+                del self._entries[key]
+
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self.bytes > self.max_bytes)
+            ):
+                old_key, _ = self._entries.popitem(last=False)
+                self.bytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class PersistentCache:
+    def __init__(self, path: str, version: str, max_bytes: int = 64 * 1024 * 1024):
+        """Json-serializable results kept in an sqlite file across sessions
+
+        Keys are xxhashes of the version and the arguments passed to `key`. Everything is dropped whenever
+        the cache is opened (or `set_version` is called) with a different version, and the least recently
+        used results are evicted once the stored data goes over `max_bytes`.
+
+        Args:
+            path (str): Path to the cache file, created if it doesn't exist.
+            version (str): Version of whatever produced the results, e.g. the dictionary they came from.
+            max_bytes (int, optional): Maximum size of the stored results. Defaults to 64 MiB.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS "results" (
+	"key" BLOB NOT NULL,
+	"data" BLOB NOT NULL,
+	"size" INTEGER NOT NULL,
+	"used" REAL NOT NULL,
+	PRIMARY KEY("key")
+);""")
+        self.connection.execute('CREATE INDEX IF NOT EXISTS "results_used" ON "results" ("used")')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS "meta" ("key" TEXT PRIMARY KEY, "value" TEXT)')
+        self.connection.commit()
+
+        self._lock = Lock()
+        self._touched: dict[bytes, float] = {} # hits only update "used" with the next write
+
+        self.version = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.set_version(version)
+
+    def set_version(self, version: str):
+        """Switches to a new version, dropping every stored result if it differs from the file's"""
+        with self._lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+
+            if row is None or row[0] != version:
+                self.connection.execute("DELETE FROM results")
+                self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (version,))
+                self.connection.commit()
+
+            self.version = version
+            self.bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            self._touched.clear()
+
+    def key(self, *parts) -> bytes:
+        return xxhash.xxh3_128_digest("\0".join(map(str, (self.version, *parts))).encode("utf-8"))
+
+    def get(self, key: bytes, default=MISSING):
+        with self._lock:
+            row = self.connection.execute("SELECT data FROM results WHERE key = ?", (key,)).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._touched[key] = time()
+
+        return ujson.loads(row[0])
+
+    def put(self, key: bytes, value):
+        self.put_many({key: value})
+
+    def put_many(self, items: dict):
+        """Stores several results in one transaction"""
+        rows = [(key, ujson.dumps(value, ensure_ascii=False).encode("utf-8")) for key, value in items.items()]
+        now = time()
+
+        with self._lock:
+            self._write_touched()
+
+            for key, data in rows:
+                old = self.connection.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+                self.bytes += len(data) - (old[0] if old else 0)
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO results (key, data, size, used) VALUES (?, ?, ?, ?)",
+                    (key, data, len(data), now)
+                )
+
+            if self.bytes > self.max_bytes:
+                self._evict(self.max_bytes * 0.9) # leave some room so the next puts don't evict again
+
+            self.connection.commit()
+
+    def _evict(self, target: float):
+        while self.bytes > target:
+            oldest = self.connection.execute("SELECT key, size FROM results ORDER BY used LIMIT 100").fetchall()
+
+            if not oldest:
+                break
+
+            for key, size in oldest:
+                self.connection.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.bytes -= size
+                self.evictions += 1
+
+                if self.bytes <= target:
+                    break
+
+    def _write_touched(self):
+        self.connection.executemany(
+            "UPDATE results SET used = ? WHERE key = ?",
+            [(used, key) for key, used in self._touched.items()]
+        )
+        self._touched.clear()
+
+    def clear(self):
+        with self._lock:
+            self.connection.execute("DELETE FROM results")
+            self.connection.commit()
+            self.bytes = 0
+            self._touched.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+
+        with self._lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+        return {
+            "entries": entries,
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._write_touched()
+            self.connection.commit()
+            self.connection.close()
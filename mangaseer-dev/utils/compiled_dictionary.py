@@ -0,0 +1,181 @@
+import os
+import mmap
+import shutil
+import struct
+import ujson
+from array import array
+from tempfile import TemporaryFile
+from zlib import crc32
+
+
+MAGIC = b"MSDC"
+VERSION = 2
+
+# magic, format version, number of keys, number of hash slots
+HEADER = struct.Struct("<4sIQQ")
+
+
+def encode_key(table: str, surface: str) -> bytes:
+    return f"{table}:{surface}".encode("utf-8")
+
+
+def write_compiled_dictionary(path: str, entries):
+    """Writes a compiled dictionary file
+
+    Layout: header, key offsets (uint64[count + 1]), record offsets (uint64[count + 1]), hash slots (uint32, key
+    index + 1 at the crc32 of the key or after it, 0 for empty), key blob (sorted utf-8 "table:surface" keys) and
+    record blob (one json list of words per key). Offsets use the native byte order, compiled files are meant to be
+    built on the machine using them.
+
+    Open `CompiledDictionary` instances have the file mapped, so it's written next to it and swapped in once it's
+    complete rather than truncated under them.
+
+    Args:
+        path (str): Path of the file to write.
+        entries: Iterable of (table, surface, words) sorted by their encoded key.
+
+    Raises:
+        RuntimeError: If the file is in use and can't be replaced (Windows), it's left as it was.
+    """
+    key_offsets = array("Q", [0])
+    record_offsets = array("Q", [0])
+    hashes = array("I")
+    keys = bytearray()
+    previous = None
+
+    with TemporaryFile() as records:
+        for table, surface, words in entries:
+            key = encode_key(table, surface)
+
+            if previous is not None and key <= previous:
+                raise ValueError("entries must be sorted by key and unique")
+
+            previous = key
+            hashes.append(crc32(key))
+            keys += key
+            key_offsets.append(len(keys))
+            records.write(ujson.dumps(words, ensure_ascii=False).encode("utf-8"))
+            record_offsets.append(records.tell())
+
+        # open addressing at most half full, so a lookup is about one probe
+        size = 8
+
+        while size < 2 * len(hashes):
+            size *= 2
+
+        slots = array("I", bytes(4 * size))
+        mask = size - 1
+
+        for index, key_hash in enumerate(hashes):
+            slot = key_hash & mask
+
+            while slots[slot]:
+                slot = (slot + 1) & mask
+
+            slots[slot] = index + 1
+
+        records.seek(0)
+        new_path = f"{path}.new"
+
+        try:
+            with open(new_path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, len(key_offsets) - 1, size))
+                f.write(key_offsets.tobytes())
+                f.write(record_offsets.tobytes())
+                f.write(slots.tobytes())
+                f.write(keys)
+                shutil.copyfileobj(records, f)
+
+            try:
+                os.replace(new_path, path)
+            except PermissionError as e:
+                raise RuntimeError(f"{path} is in use, close MangaSeer and compile again") from e
+        finally:
+            if os.path.exists(new_path):
+                os.remove(new_path)
+
+
+class CompiledDictionary:
+    def __init__(self, path: str):
+        """Read-only dictionary opened via mmap, made by `utils.dictionary.compile_dictionary`
+
+        Keys are found through the hash slots and compared in place (`mmap.find` within the key's span), so a lookup
+        doesn't copy anything out of the file except the record it returns. Encoding the key and the ints the
+        offsets are read as are the only other allocations.
+
+        Args:
+            path (str): Path to the compiled dictionary file.
+        """
+        self.path = path
+
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.count, slots = HEADER.unpack_from(self.mm, 0)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a compiled dictionary (version {VERSION})")
+
+        view = memoryview(self.mm)
+        offsets_size = (self.count + 1) * 8
+        position = HEADER.size
+
+        # casts index straight into the mapping, nothing is copied
+        self.key_offsets = view[position:position + offsets_size].cast("Q")
+        position += offsets_size
+        self.record_offsets = view[position:position + offsets_size].cast("Q")
+        position += offsets_size
+        self.slots = view[position:position + slots * 4].cast("I")
+        self.mask = slots - 1
+        position += slots * 4
+
+        self.keys_start = position
+        self.records_start = position + self.key_offsets[self.count]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _find(self, key: bytes) -> int:
+        keys_start = self.keys_start
+        key_offsets = self.key_offsets
+        slot = crc32(key) & self.mask
+
+        while index := self.slots[slot]:
+            start = keys_start + key_offsets[index - 1]
+
+            # same length and found right at the start of the span means the same bytes
+            if keys_start + key_offsets[index] - start == len(key) and self.mm.find(key, start, start + len(key)) == start:
+                return index - 1
+
+            slot = (slot + 1) & self.mask
+
+        return -1
+
+    def get(self, table: str, surface: str) -> list[dict] | None:
+        index = self._find(encode_key(table, surface))
+
+        if index == -1:
+            return None
+
+        return ujson.loads(self.mm[
+            self.records_start + self.record_offsets[index]:self.records_start + self.record_offsets[index + 1]
+        ])
+
+    def lookup(self, surfaces: dict[str, set[str]]) -> dict[tuple[str, str], list[dict]]:
+        """Same as `JMDict.fetch_words` / `JMDict.fetch_names`, but reading from the compiled file"""
+        words = {}
+
+        for table, texts in surfaces.items():
+            for text in texts:
+                entries = self.get(table, text)
+
+                if entries is not None:
+                    words[(table, text)] = entries
+
+        return words
+
+    def close(self):
+        self.key_offsets.release()
+        self.record_offsets.release()
+        self.slots.release()
+        self.mm.close()
@@ -0,0 +1,75 @@
+import sqlite3
+from os.path import abspath, basename
+from threading import Lock, local
+from urllib.request import pathname2url
+from utils.query_stats import QueryStats
+
+
+class ConnectionPool:
+    def __init__(
+            self,
+            path: str,
+            mmap_size: int = 256 * 1024 * 1024,
+            immutable: bool = True,
+            stats: QueryStats | None = None
+        ):
+        """Read-only sqlite connections, one per thread, so lookups can run from any thread without locking
+
+        Args:
+            path (str): Path to the database.
+            mmap_size (int, optional): PRAGMA mmap_size for each connection. Defaults to 256 MiB.
+            immutable (bool, optional): Open with immutable=1, skipping all file locking. The database must not
+                change while open, call `reset` after rebuilding it. Defaults to True.
+            stats (QueryStats | None, optional): Records the queries run through `cursor` on every connection.
+                Defaults to None.
+        """
+        self.path = path
+        self.mmap_size = mmap_size
+        self.stats = stats
+        self.uri = f"file:{pathname2url(abspath(path))}?mode=ro&cache=shared"
+
+        if immutable:
+            self.uri += "&immutable=1"
+
+        self._local = local()
+        self._lock = Lock()
+        self._connections: list[sqlite3.Connection] = []
+        self._generation = 0
+
+    def connection(self) -> sqlite3.Connection:
+        """Returns the calling thread's connection, opening it on first use"""
+        if getattr(self._local, "generation", None) != self._generation:
+            connection = sqlite3.connect(self.uri, uri=True)
+            connection.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+
+            self._local.connection = connection
+            self._local.cursor = self.stats.install(connection, basename(self.path)) if self.stats is not None else connection.cursor()
+            self._local.generation = self._generation
+
+            with self._lock:
+                self._connections.append(connection)
+
+        return self._local.connection
+
+    def cursor(self) -> sqlite3.Cursor:
+        """Returns the calling thread's cursor"""
+        self.connection()
+
+        return self._local.cursor
+
+    def reset(self):
+        """Makes every thread reopen its connection on next use, e.g. after the database file was replaced"""
+        with self._lock:
+            self._generation += 1
+            connections, self._connections = self._connections, []
+
+        # connections belonging to other threads can't be closed from here, they're released once those threads
+        # drop them (sqlite3 would raise ProgrammingError)
+        for connection in connections:
+            try:
+                connection.close()
+            except sqlite3.ProgrammingError:
+                pass
+
+    def close(self):
+        self.reset()
@@ -1,177 +1,1527 @@
+import os
+import re
 import ujson
+import shutil
 import sqlite3
-from sudachipy import tokenizer, dictionary
+from json import JSONDecoder, JSONDecodeError
+from hashlib import blake2b
+from time import perf_counter
+from threading import Lock
+from utils.cache import LRUCache, PersistentCache, MISSING
+from utils.connection_pool import ConnectionPool
+from utils.query_stats import QueryStats
+from utils.headword_trie import HeadwordTrie
+from utils.fuzzy import bigrams, min_shared_bigrams, edit_distance
+from utils.compiled_dictionary import CompiledDictionary, encode_key, write_compiled_dictionary
+from utils.tokenizer import SudachiTokenizer, get_tokenizer
+from utils.records import Token, Word, Name, Sense, Gloss, Translation, LazyRecord, intern_tags
+from utils.pitch_accent import MORA_SEPARATOR, accent_rows, decode_pattern, read_accents
+from utils.resource_pack import get_resources
 from pprint import pp
+from contextlib import nullcontext
+from functools import partial
 
 
-# add the json to the file directly?
-with open("jmdict_tags.json", "r", encoding="utf-8") as f:
-    jmdict_tags: dict[str, str] = ujson.load(f)
+# shared with dataset.py, loaded from resources.pack (see compile_resources.py) without parsing the json
+_resources = get_resources()
+jmdict_tags: dict[str, str] = _resources.jmdict_tags
+jmnedict_tags: dict[str, str] = _resources.jmnedict_tags
+kanji: frozenset[str] = _resources.kanji
+sudachi_to_jmdict: dict[str, tuple[str, str]] = _resources.pos_tags
 
-with open("jmnedict_tags.json", "r", encoding="utf-8") as f:
-    jmnedict_tags: dict[str, str] = ujson.load(f)
 
-with open("manga_datasets/japanese/kanji.txt", "r", encoding="utf-8") as f:
-    kanji: set[str] = set([k.strip() for k in f.readlines()])
+# sqlite's default SQLITE_MAX_VARIABLE_NUMBER on older builds is 999
+MAX_PARAMS = 900
 
-with open("pos_tags.json", "r", encoding="utf-8") as f:
-    sudachi_to_jmdict: dict[str, str] = ujson.load(f)
+# a lone prefix this short can match most of the glossary, so `search_gloss` ranks the first matches it finds
+# rather than running bm25 over every one of them
+SHORT_PREFIX_LENGTH = 3
+SHORT_PREFIX_CANDIDATES = 2000
+
+# bumped whenever the output of JMDict.lookup changes, so results persisted by older versions aren't reused
+RESULT_FORMAT = 2
+
+
+def _copy_words(words: tuple[Word | Name, ...]) -> tuple[Word | Name, ...]:
+    return tuple(word.copy() for word in words)
+
+
+def _chunks(items: list, size: int = MAX_PARAMS):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
 
 class JMDict:
-    def __init__(self, jmdict_path: str, jmnedict_path: str):
-        self.jmdict_connection = sqlite3.connect(jmdict_path)
-        self.jmdict_cursor = self.jmdict_connection.cursor()
+    def __init__(
+            self,
+            jmdict_path: str,
+            jmnedict_path: str,
+            cache_size: int = 50000,
+            cache_bytes: int | None = None,
+            backend: str = "sqlite",
+            trie_path: str | None = None,
+            result_cache_path: str | None = None,
+            result_cache_bytes: int = 64 * 1024 * 1024,
+            query_stats: bool = False,
+            tokenizer: SudachiTokenizer | None = None
+        ):
+        """Japanese dictionary backed by jmdict and jmnedict
+
+        Args:
+            jmdict_path (str): Path to jmdict.db, or the compiled jmdict file for the "compiled" backend.
+            jmnedict_path (str): Path to jmnedict.db, or the compiled jmnedict file for the "compiled" backend.
+            cache_size (int, optional): Maximum number of cached token results. Defaults to 50000.
+            cache_bytes (int | None, optional): Maximum estimated size of cached results, and separately of cached
+                senses / translations. Defaults to None.
+            backend (str, optional): "sqlite", or "compiled" for files made by `compile_dictionary`. Defaults to "sqlite".
+            trie_path (str | None, optional): Headword file made by `build_headword_trie` for `mode="trie"` lookups.
+                Defaults to None (built from the databases on first use).
+            result_cache_path (str | None, optional): File to keep whole lookup results in across sessions, they're
+                dropped whenever either database changes. Defaults to None (disabled).
+            result_cache_bytes (int, optional): Maximum size of the persisted results. Defaults to 64 MiB.
+            query_stats (bool, optional): Record every sqlite query (count, time, rows) and how many each lookup
+                needs, see `JMDict.stats`. Slows queries down slightly. Defaults to False.
+            tokenizer (SudachiTokenizer | None, optional): Tokenizer for "sudachi" lookups. Defaults to None (the
+                shared one from `get_tokenizer`, its dictionary is loaded on the first lookup).
+
+        Lookups are safe to run from several threads at once, each thread gets its own read-only connection.
+        """
+        self.backend = backend
+        self.jmdict_path = jmdict_path
+        self.jmnedict_path = jmnedict_path
+        self.query_stats = QueryStats() if query_stats else None
+
+        if backend == "sqlite":
+            self.jmdict_pool = ConnectionPool(jmdict_path, stats=self.query_stats)
+            self.jmnedict_pool = ConnectionPool(jmnedict_path, stats=self.query_stats)
+
+            self.jmdict_entries = _has_table(self.jmdict_connection, "entries")
+            self.jmnedict_entries = _has_table(self.jmnedict_connection, "entries")
+            self.jmdict_ngrams = _has_table(self.jmdict_connection, "ngrams")
+            self.jmdict_fts = _has_table(self.jmdict_connection, "glossary_fts")
+            self.jmdict_accents = _has_table(self.jmdict_connection, "accents")
+        elif backend == "compiled":
+            self.jmdict_compiled = CompiledDictionary(jmdict_path)
+            self.jmnedict_compiled = CompiledDictionary(jmnedict_path)
+        else:
+            raise ValueError(f"unknown dictionary backend {backend!r}")
+
+        self.tokenizer = tokenizer or get_tokenizer()
+        self._trie_lock = Lock()
+
+        self.trie_path = trie_path
+        self._trie = None
+
+        # token-level results keyed by (surface, table, common), common is None for jmnedict names. the words in
+        # it are never hydrated, lookups hand out copies
+        self.cache = LRUCache(cache_size, cache_bytes)
+        # what `hydrate_many` loaded, keyed by (lazy_key, word id), so it's measured and evicted on its own
+        self.lazy_cache = LRUCache(cache_size, cache_bytes)
+        self._database_signature = self._get_database_signature()
+
+        # whole results keyed by (text, common, mode, fuzzy), survives restarts
+        self.result_cache = None
+
+        if result_cache_path:
+            self.result_cache = PersistentCache(result_cache_path, self._result_version(), result_cache_bytes)
+
+    def _get_database_signature(self) -> tuple:
+        return tuple(
+            (stat.st_ino, stat.st_mtime_ns, stat.st_size) # updates replace the file
+            for stat in map(os.stat, (self.jmdict_path, self.jmnedict_path))
+        )
+
+    def _result_version(self) -> str:
+        return f"{RESULT_FORMAT}:{SCHEMA_VERSION}:{self.backend}:{self._database_signature}"
+
+    def _validate_cache(self):
+        """Clears the caches if either database file was rebuilt, updated or migrated since they were filled"""
+        signature = self._get_database_signature()
+
+        if signature != self._database_signature:
+            self.cache.clear()
+            self.lazy_cache.clear()
+            self._database_signature = signature
+
+            if self.result_cache is not None:
+                self.result_cache.set_version(self._result_version())
+
+            if self.backend == "sqlite": # immutable connections must not outlive a rebuild
+                self.jmdict_pool.reset()
+                self.jmnedict_pool.reset()
+                self.jmdict_entries = _has_table(self.jmdict_connection, "entries")
+                self.jmnedict_entries = _has_table(self.jmnedict_connection, "entries")
+                self.jmdict_ngrams = _has_table(self.jmdict_connection, "ngrams")
+                self.jmdict_fts = _has_table(self.jmdict_connection, "glossary_fts")
+                self.jmdict_accents = _has_table(self.jmdict_connection, "accents")
+
+    @property
+    def jmdict_connection(self) -> sqlite3.Connection:
+        return self.jmdict_pool.connection()
+
+    @property
+    def jmdict_cursor(self) -> sqlite3.Cursor:
+        return self.jmdict_pool.cursor()
+
+    @property
+    def jmnedict_connection(self) -> sqlite3.Connection:
+        return self.jmnedict_pool.connection()
+
+    @property
+    def jmnedict_cursor(self) -> sqlite3.Cursor:
+        return self.jmnedict_pool.cursor()
+
+    def cache_stats(self) -> dict:
+        return {**self.cache.stats(), "lazy": self.lazy_cache.stats()}
+
+    def stats(self) -> dict:
+        """Queries recorded since creation (or `reset_stats`), needs `query_stats=True`
+
+        Returns:
+            dict: See `QueryStats.stats`, empty if queries aren't recorded.
+        """
+        return self.query_stats.stats() if self.query_stats is not None else {}
 
-        self.jmnedict_connection = sqlite3.connect(jmnedict_path)
-        self.jmnedict_cursor = self.jmnedict_connection.cursor()
+    def dump_stats(self, path: str):
+        """Writes `JMDict.stats` to a json file, e.g. to diff the queries of two versions"""
+        if self.query_stats is None:
+            raise ValueError("queries aren't recorded, create the JMDict with query_stats=True")
 
-        self.sudachi_dict = dictionary.Dictionary(dict="full").create()
+        self.query_stats.dump(path)
+
+    def reset_stats(self):
+        if self.query_stats is not None:
+            self.query_stats.reset()
+
+    def _measure(self, name: str, items: int = 1):
+        return self.query_stats.measure(name, items) if self.query_stats is not None else nullcontext()
     
     @staticmethod
-    def _get_tags(tags: str) -> list[str]:
-        if not tags:
-            return []
-
-        return tags.split(",")
+    def _get_tags(tags: str) -> tuple[str, ...]:
+        return intern_tags(tags)
     
     @staticmethod
     def tag_text(tag: str) -> str:
         return jmdict_tags.get(tag) or jmnedict_tags.get(tag)
 
-    def lookup(self, text: str, common=True) -> list[dict]:
+    @staticmethod
+    def _select_in(cursor: sqlite3.Cursor, query: str, values: list) -> list[tuple]:
+        """Runs `query` once per chunk of `values`, substituting `{}` with the placeholders"""
+        rows = []
+
+        for chunk in _chunks(values):
+            rows.extend(cursor.execute(
+                query.format(", ".join("?" * len(chunk))),
+                chunk
+            ).fetchall())
+
+        return rows
+
+    @property
+    def trie(self) -> HeadwordTrie:
+        with self._trie_lock:
+            if self._trie is None:
+                if self.trie_path:
+                    self._trie = HeadwordTrie.load(self.trie_path)
+                elif self.backend == "sqlite":
+                    self._trie = HeadwordTrie.from_databases(self.jmdict_path, self.jmnedict_path)
+                else:
+                    raise ValueError("trie lookups with the compiled backend need a trie_path")
+
+        return self._trie
+
+    def _tokenize(self, text: str, mode: str = "sudachi") -> list[tuple[str, set[str], list, str | None]]:
+        """Splits text into (surface, sudachi pos, jmdict pos, headword to look up) tokens"""
+        if mode == "trie":
+            return [(surface, set(), [], headword) for surface, headword in self.trie.segment(text)]
+
+        if mode != "sudachi":
+            raise ValueError(f"unknown lookup mode {mode!r}")
+
+        tokens = []
+
+        for morpheme in self.tokenizer.tokenize(text, "A"):
+            pos = set(morpheme.part_of_speech())
+
+            parts_of_speech = [sudachi_to_jmdict.get(p) for p in pos if p in sudachi_to_jmdict]
+
+            tokens.append((morpheme.raw_surface(), pos, parts_of_speech, morpheme.raw_surface()))
+
+        return tokens
+
+    @staticmethod
+    def fetch_words(
+            cursor: sqlite3.Cursor,
+            surfaces: dict[str, set[str]],
+            senses: bool = True,
+            entries: bool = False,
+            accents: bool = False
+        ) -> dict[tuple[str, str], list[Word]]:
+        """Resolves jmdict headwords and readings for every surface in a few queries
+
+        Args:
+            cursor (sqlite3.Cursor): Cursor of the database to query.
+            surfaces (dict[str, set[str]]): Surfaces to look up, keyed by table ("kanji" or "kana").
+            senses (bool, optional): Whether to also fetch senses and glosses. Defaults to True.
+            entries (bool, optional): Whether to read senses from the pre-joined entries table. Defaults to False.
+            accents (bool, optional): Whether to fetch the pitch accents of each word's reading, needs the accents
+                table from `build_accents`. Defaults to False.
+
+        Returns:
+            dict[tuple[str, str], list[Word]]: Words keyed by (table, surface).
+        """
+        words: dict[tuple[str, str], list[Word]] = {}
+        word_ids = set()
+        kanji_ids = set()
+
+        for table, texts in surfaces.items():
+            for text, word_id, tags, common in JMDict._select_in(
+                cursor,
+                f"SELECT text, word_id, tags, common FROM {table} WHERE text IN ({{}}) ORDER BY id",
+                list(texts)
+            ):
+                words.setdefault((table, text), []).append(Word(word_id, JMDict._get_tags(tags), bool(common)))
+                word_ids.add(word_id)
+
+                if table == "kanji":
+                    kanji_ids.add(word_id)
+
+        if not word_ids:
+            return words
+
+        if senses and entries:
+            word_entries = JMDict.fetch_entries(cursor, word_ids)
+            readings = {word_id: entry["readings"][0] for word_id, entry in word_entries.items() if entry["readings"]}
+            word_senses = {
+                word_id: [Sense.from_dict(sense) for sense in entry["senses"]]
+                for word_id, entry in word_entries.items()
+            }
+        else:
+            readings = JMDict.fetch_readings(cursor, kanji_ids)
+            word_senses = JMDict.fetch_senses(cursor, word_ids) if senses else None
+
+        pitch = JMDict.fetch_pitch(cursor, word_ids) if accents else {}
+
+        for (table, text), entries in words.items():
+            for word in entries:
+                if table == "kanji":
+                    word.reading = readings[word.id]
+
+                if senses:
+                    word.senses = word_senses.get(word.id, [])
+
+                # accents belong to one reading, kana words are their own reading
+                patterns = pitch.get((word.id, word.reading if table == "kanji" else text))
+
+                if patterns:
+                    word.pitch = patterns
+
+        return words
+
+    @staticmethod
+    def fetch_entries(cursor: sqlite3.Cursor, word_ids: set[int]) -> dict[int, dict]:
+        """Fetches pre-joined entries (readings plus senses or translations) from the entries table
+
+        Args:
+            cursor (sqlite3.Cursor): Cursor of a database built with the entries table.
+            word_ids (set[int]): Ids of the words.
+
+        Returns:
+            dict[int, dict]: Decoded entries keyed by word id.
+        """
+        return {
+            word_id: ujson.loads(data)
+            for word_id, data in JMDict._select_in(
+                cursor,
+                "SELECT word_id, data FROM entries WHERE word_id IN ({})",
+                list(word_ids)
+            )
+        }
+
+    @staticmethod
+    def fetch_readings(cursor: sqlite3.Cursor, word_ids: set[int]) -> dict[int, str]:
+        readings = {}
+
+        for word_id, text in JMDict._select_in(
+            cursor,
+            "SELECT word_id, text FROM kana WHERE word_id IN ({}) ORDER BY id",
+            list(word_ids)
+        ):
+            readings.setdefault(word_id, text)
+
+        return readings
+
+    @staticmethod
+    def fetch_pitch(cursor: sqlite3.Cursor, word_ids: set[int]) -> dict[tuple[int, str], tuple]:
+        """Fetches the pitch accent patterns `build_accents` linked to the readings of the given words
+
+        Args:
+            cursor (sqlite3.Cursor): Cursor of a database with the accents table.
+            word_ids (set[int]): Ids of the words.
+
+        Returns:
+            dict[tuple[int, str], tuple]: Patterns as (mora, "high" / "low") pairs, keyed by (word id, reading).
+        """
+        pitch: dict[tuple[int, str], list] = {}
+
+        for word_id, reading, morae, pattern in JMDict._select_in(
+            cursor,
+            """SELECT accents.word_id, kana.text, accents.morae, accents.pattern FROM accents
+            JOIN kana ON kana.id = accents.kana_id WHERE accents.word_id IN ({}) ORDER BY accents.id""",
+            list(word_ids)
+        ):
+            pitch.setdefault((word_id, reading), []).append(decode_pattern(morae.split(MORA_SEPARATOR), pattern))
+
+        return {key: tuple(patterns) for key, patterns in pitch.items()}
+
+    @staticmethod
+    def fetch_senses(cursor: sqlite3.Cursor, word_ids: set[int]) -> dict[int, list[Sense]]:
+        """Fetches the senses and glosses of jmdict words
+
+        Args:
+            cursor (sqlite3.Cursor): Cursor of the jmdict database.
+            word_ids (set[int]): Ids of the words.
+
+        Returns:
+            dict[int, list[Sense]]: Senses keyed by word id, words without senses are left out.
+        """
+        senses: dict[int, list[Sense]] = {}
+        sense_index: dict[int, Sense] = {}
+
+        for info in JMDict._select_in(
+            cursor,
+            "SELECT id, word_id, dialect, misc, info, pos, field FROM senses WHERE word_id IN ({}) ORDER BY id",
+            list(word_ids)
+        ):
+            sense = Sense(
+                info[0],
+                JMDict._get_tags(info[2]),
+                JMDict._get_tags(info[3]),
+                info[4].replace("\n", "") if info[4] else None,
+                JMDict._get_tags(info[5]),
+                JMDict._get_tags(info[6]),
+                []
+            )
+            senses.setdefault(info[1], []).append(sense)
+            sense_index[info[0]] = sense
+
+        for sense_id, gender, text, lang in JMDict._select_in(
+            cursor,
+            "SELECT glossary.sense_id, glossary.gender, glossary.text, glossary.lang FROM glossary "
+            "JOIN senses ON senses.id = glossary.sense_id WHERE senses.word_id IN ({}) ORDER BY glossary.id",
+            list(word_ids)
+        ):
+            sense_index[sense_id].gloss.append(Gloss(gender, text, lang))
+
+        return senses
+
+    @staticmethod
+    def fetch_names(
+            cursor: sqlite3.Cursor,
+            surfaces: dict[str, set[str]],
+            translations: bool = True,
+            entries: bool = False
+        ) -> dict[tuple[str, str], list[Name]]:
+        """Resolves jmnedict headwords and readings for every surface in a few queries
+
+        Args:
+            cursor (sqlite3.Cursor): Cursor of the database to query.
+            surfaces (dict[str, set[str]]): Surfaces to look up, keyed by table ("kanji" or "kana").
+            translations (bool, optional): Whether to also fetch translations. Defaults to True.
+            entries (bool, optional): Whether to read translations from the pre-joined entries table. Defaults to False.
+
+        Returns:
+            dict[tuple[str, str], list[Name]]: Names keyed by (table, surface).
+        """
+        words: dict[tuple[str, str], list[Name]] = {}
+        word_ids = set()
+        kanji_ids = set()
+
+        for table, texts in surfaces.items():
+            for text, word_id, tags in JMDict._select_in(
+                cursor,
+                f"SELECT text, word_id, tags FROM {table} WHERE text IN ({{}}) ORDER BY id",
+                list(texts)
+            ):
+                words.setdefault((table, text), []).append(Name(word_id, JMDict._get_tags(tags)))
+                word_ids.add(word_id)
+
+                if table == "kanji":
+                    kanji_ids.add(word_id)
+
+        if not word_ids:
+            return words
+
+        if translations and entries:
+            word_entries = JMDict.fetch_entries(cursor, word_ids)
+            readings = {word_id: entry["readings"][0] for word_id, entry in word_entries.items() if entry["readings"]}
+            word_translations = {
+                word_id: [Translation.from_dict(translation) for translation in entry["translations"]]
+                for word_id, entry in word_entries.items()
+            }
+        else:
+            readings = JMDict.fetch_readings(cursor, kanji_ids)
+            word_translations = JMDict.fetch_translations(cursor, word_ids) if translations else None
+
+        for (table, _), entries in words.items():
+            for word in entries:
+                if table == "kanji":
+                    word.reading = readings[word.id]
+
+                if translations:
+                    word.translations = word_translations.get(word.id, [])
+
+        return words
+
+    @staticmethod
+    def fetch_translations(cursor: sqlite3.Cursor, word_ids: set[int]) -> dict[int, list[Translation]]:
+        translations: dict[int, list[Translation]] = {}
+
+        for word_id, text, translation_type in JMDict._select_in(
+            cursor,
+            "SELECT word_id, text, type FROM translations WHERE word_id IN ({}) ORDER BY id",
+            list(word_ids)
+        ):
+            translations.setdefault(word_id, []).append(Translation(
+                text.replace("\n", "") if text else None,
+                JMDict._get_tags(translation_type)
+            ))
+
+        return translations
+
+    def _lookup_words(self, surfaces: dict[str, set[str]]) -> dict[tuple[str, str], list[Word]]:
+        if self.backend == "compiled":
+            return {
+                key: [Word.from_dict(word) for word in entries]
+                for key, entries in self.jmdict_compiled.lookup(surfaces).items()
+            }
+
+        words = self.fetch_words(self.jmdict_cursor, surfaces, senses=False, accents=self.jmdict_accents)
+
+        for entries in words.values():
+            for word in entries:
+                word.loader = self.hydrate_many
+
+        return words
+
+    def _lookup_names(self, surfaces: dict[str, set[str]]) -> dict[tuple[str, str], list[Name]]:
+        if self.backend == "compiled":
+            return {
+                key: [Name.from_dict(word) for word in entries]
+                for key, entries in self.jmnedict_compiled.lookup(surfaces).items()
+            }
+
+        words = self.fetch_names(self.jmnedict_cursor, surfaces, translations=False)
+
+        for entries in words.values():
+            for word in entries:
+                word.loader = self.hydrate_many
+
+        return words
+
+    def hydrate(self, word_id: int, name: bool = False) -> list[Sense] | list[Translation]:
+        """Fetches the senses of a jmdict word, or the translations of a jmnedict name
+
+        Args:
+            word_id (int): Id of the word.
+            name (bool, optional): Whether `word_id` is a jmnedict id. Defaults to False.
+
+        Returns:
+            list[Sense] | list[Translation]: The senses (with glosses) or translations of the word.
+        """
+        return self.fetch_lazy("translations" if name else "senses", {word_id}).get(word_id, [])
+
+    def fetch_lazy(self, lazy_key: str, word_ids: set[int]) -> dict[int, list[Sense] | list[Translation]]:
+        """Fetches what `hydrate_many` fills in for a set of words
+
+        Args:
+            lazy_key (str): "senses" for jmdict words, "translations" for jmnedict names.
+            word_ids (set[int]): Ids of the words.
+
+        Returns:
+            dict[int, list[Sense] | list[Translation]]: The senses / translations by word id, words without any are left out.
+        """
+        if lazy_key == "senses":
+            cursor, has_entries, fetch, record = self.jmdict_cursor, self.jmdict_entries, self.fetch_senses, Sense
+        else:
+            cursor, has_entries, fetch, record = (
+                self.jmnedict_cursor, self.jmnedict_entries, self.fetch_translations, Translation
+            )
+
+        if has_entries: # one row per word instead of walking senses -> glossary
+            return {
+                word_id: [record.from_dict(item) for item in entry[lazy_key]]
+                for word_id, entry in self.fetch_entries(cursor, word_ids).items()
+            }
+
+        return fetch(cursor, word_ids)
+
+    def fuzzy_lookup(self, token: str, max_distance: int = 1, limit: int = 10) -> list[tuple[str, int]]:
+        """Finds jmdict headwords within a few edits of the token, e.g. to recover from OCR swapping similar kanji
+
+        Candidates come from the bigram index, so only headwords of a similar length that share enough
+        bigrams with the token are ever compared.
+
+        Args:
+            token (str): The (possibly misrecognized) word.
+            max_distance (int, optional): Maximum edit distance. Defaults to 1.
+            limit (int, optional): Maximum number of candidates. Defaults to 10.
+
+        Returns:
+            list[tuple[str, int]]: (headword, edit distance) pairs, closest and most similar first.
+        """
+        if self.backend != "sqlite" or not self.jmdict_ngrams:
+            return []
+
+        grams = list(bigrams(token))
+        candidates = []
+
+        for text, shared in self.jmdict_cursor.execute(
+            f"SELECT text, COUNT(*) FROM ngrams WHERE gram IN ({', '.join('?' * len(grams))}) "
+            "AND length BETWEEN ? AND ? GROUP BY text HAVING COUNT(*) >= ?",
+            (*grams, len(token) - max_distance, len(token) + max_distance, min_shared_bigrams(len(token), max_distance))
+        ).fetchall():
+            distance = edit_distance(token, text, max_distance)
+
+            if distance <= max_distance:
+                candidates.append((distance, -shared, abs(len(text) - len(token)), text))
+
+        candidates.sort()
+
+        return [(text, distance) for distance, _, _, text in candidates[:limit]]
+
+    def search_gloss(self, query: str, limit: int = 20, lang: str = "eng") -> list[dict]:
+        """Searches the dictionary by meaning (english to japanese), ranked by bm25 over the glossary
+
+        The last word of the query is matched as a prefix (once it's 2 characters long) so results can update
+        while typing. A lone short prefix only ranks its first `SHORT_PREFIX_CANDIDATES` matches.
+
+        Args:
+            query (str): The meaning to search for, e.g. "mountain".
+            limit (int, optional): Maximum number of words. Defaults to 20.
+            lang (str, optional): Glossary language to search. Defaults to "eng".
+
+        Returns:
+            list[dict]: Words with their id, headword, reading (None for kana-only words) and best matching gloss.
+        """
+        terms = re.findall(r"\w+", query)
+        lang = re.sub(r"\W", "", lang)
+
+        if self.backend != "sqlite" or not self.jmdict_fts or not terms or not lang:
+            return []
+
+        match = f'lang: "{lang}" AND text: (' + " ".join(f'"{term}"' for term in terms) + ("*" if len(terms[-1]) > 1 else "") + ")"
+
+        if len(terms) == 1 and len(terms[0]) <= SHORT_PREFIX_LENGTH:
+            # without ORDER BY rank fts stops after the first candidates instead of scoring every match
+            order, candidates = "", max(SHORT_PREFIX_CANDIDATES, limit * 10)
+        else:
+            order, candidates = "ORDER BY rank", limit * 10
+
+        results = self.jmdict_cursor.execute(
+            f"""SELECT word_id, text, MIN(score) FROM (
+                SELECT senses.word_id AS word_id, glossary.text AS text, bm25(glossary_fts) AS score FROM glossary_fts
+                JOIN glossary ON glossary.id = glossary_fts.rowid
+                JOIN senses ON senses.id = glossary.sense_id
+                WHERE glossary_fts MATCH ?
+                {order} LIMIT ?
+            ) GROUP BY word_id ORDER BY MIN(score) LIMIT ?""",
+            (match, candidates, limit)
+        ).fetchall()
+
+        word_ids = [word_id for word_id, _, _ in results]
+        headwords = {}
+
+        for table in ("kana", "kanji"): # kanji last so it takes priority as the headword
+            for word_id, text in self._select_in(
+                self.jmdict_cursor,
+                f"SELECT word_id, text FROM {table} WHERE word_id IN ({{}}) ORDER BY id DESC",
+                word_ids
+            ):
+                headwords.setdefault(table, {})[word_id] = text
+
+        kanji_headwords = headwords.get("kanji", {})
+        kana_headwords = headwords.get("kana", {})
+
+        return [
+            {
+                "id": word_id,
+                "text": kanji_headwords.get(word_id) or kana_headwords.get(word_id),
+                "reading": kana_headwords.get(word_id) if word_id in kanji_headwords else None,
+                "gloss": gloss
+            }
+            for word_id, gloss, _ in results
+        ]
+
+    def hydrate_many(self, words: list[Word | Name]):
+        """Materializes the senses / translations of every lazy word given, in one pass
+
+        Args:
+            words (list[Word | Name]): Words returned by `JMDict.lookup`, already hydrated words are skipped.
+        """
+        pending = [word for word in words if isinstance(word, LazyRecord) and not word.hydrated]
+
+        if not pending:
+            return
+
+        loaded = {}
+        word_ids = {word.lazy_key: set() for word in pending}
+
+        for word in pending:
+            key = (word.lazy_key, word.id)
+
+            if key not in loaded:
+                loaded[key] = self.lazy_cache.get(key)
+
+                if loaded[key] is MISSING:
+                    word_ids[word.lazy_key].add(word.id)
+
+        with self._measure("hydrate_many", len(pending)):
+            for lazy_key, ids in word_ids.items():
+                if not ids:
+                    continue
+
+                fetched = self.fetch_lazy(lazy_key, ids)
+
+                for word_id in ids:
+                    loaded[(lazy_key, word_id)] = items = fetched.get(word_id, [])
+                    self.lazy_cache.put((lazy_key, word_id), items)
+
+        for word in pending:
+            setattr(word, word.lazy_key, loaded[(word.lazy_key, word.id)])
+
+    def lookup(self, text: str, common=True, mode: str = "sudachi", fuzzy: int = 0) -> list[Token]:
         """Tokenizes the given string and looks up jmdict/jmnedict definitions for each word
 
         Args:
             text (str): The text to look up.
             common (bool, optional): Whether to only include common definitions. Defaults to True.
+            mode (str, optional): "sudachi" for morphological analysis, or "trie" for greedy longest-match
+                scanning over all headwords (with simple deinflection). Defaults to "sudachi".
+            fuzzy (int, optional): If above 0, kanji words that aren't found are replaced by the closest headword
+                within this many edits, with the headword in the token's "fuzzy" key. Defaults to 0.
 
         Returns:
-            list[dict]: The tokenized string as a list, along with relevant information.
+            list[Token]: The tokenized string as a list, along with relevant information. Tokens, words, senses
+                and glosses are slotted records that can also be read like dicts (`token["words"]`).
         """
-        output = []
+        return self.lookup_many([text], common=common, mode=mode, fuzzy=fuzzy)[0]
 
-        for morpheme in self.sudachi_dict.tokenize(text, tokenizer.Tokenizer.SplitMode.A):
-            pos = set(morpheme.part_of_speech())
+    def lookup_many(self, texts: list[str], common=True, mode: str = "sudachi", fuzzy: int = 0) -> list[list[Token]]:
+        """Tokenizes every given string and looks up all of their words together
 
-            parts_of_speech = [sudachi_to_jmdict.get(p) for p in pos if p in sudachi_to_jmdict]
+        Every token surface across `texts` is resolved with a handful of set-based queries instead of
+        several queries per token, so a whole page of speech bubbles costs about as much as one.
 
-            token = morpheme.raw_surface()
+        Args:
+            texts (list[str]): The texts to look up, e.g. every OCR'd bubble on a page.
+            common (bool, optional): Whether to only include common definitions. Defaults to True.
+            mode (str, optional): Tokenization mode, see `JMDict.lookup`. Defaults to "sudachi".
+            fuzzy (int, optional): Maximum edit distance for OCR error correction, see `JMDict.lookup`. Defaults to 0.
 
-            if "助詞" in pos: # ignore particles
-                output.append({"text": token, "pos": parts_of_speech, "type": None})
-                continue
+        Returns:
+            list[list[Token]]: One tokenized list per text, in the same format as `JMDict.lookup`.
+        """
+        self._validate_cache()
 
-            if not token.isalpha():
-                output.append({
-                    "text": token,
-                    "pos": parts_of_speech,
-                    "type": None
-                })
-                continue
+        with self._measure("lookup_many", len(texts)):
+            if self.result_cache is None:
+                return self._lookup_many(texts, common, mode, fuzzy)
 
-            table = "kanji" if kanji.intersection(set(token)) else "kana"
+            keys = [self.result_cache.key(text, common, mode, fuzzy) for text in texts]
+            outputs = [self.result_cache.get(key) for key in keys]
+            missing = [i for i, output in enumerate(outputs) if output is MISSING]
 
-            if "人名" in pos: # name
-                words = [{
-                    "id": word[0],
-                    "tags": self._get_tags(word[1])
-                } for word in self.jmnedict_cursor.execute(
-                    f"SELECT word_id, tags FROM {table} WHERE text = ?",
-                    (token,)
-                ).fetchall()]
+            for i, output in enumerate(outputs):
+                if output is not MISSING:
+                    outputs[i] = [Token.from_dict(token, self.hydrate_many) for token in output]
 
-                if table == "kanji":
-                    for word in words:
-                        word["reading"] = self.jmnedict_cursor.execute(
-                            f"SELECT text FROM kana WHERE word_id = ?",
-                            (word["id"],)
-                        ).fetchone()[0]
-
-                for word in words:
-                    word["translations"] = [
-                        {
-                            "text": info[0].replace("\n", "") if info[0] else None,
-                            "type": self._get_tags(info[1])
-                        } for info in self.jmnedict_cursor.execute(
-                            f"SELECT text, type FROM translations WHERE word_id = ?",
-                            (word["id"],)
-                        ).fetchall()
-                    ]
-
-                if words:
-                    output.append({
-                        "text": token,
-                        "pos": parts_of_speech,
-                        "type": "name",
-                        "words": [word for word in words]
-                    })
+            if missing:
+                looked_up = self._lookup_many([texts[i] for i in missing], common, mode, fuzzy)
+                self.result_cache.put_many({keys[i]: self.to_plain(output) for i, output in zip(missing, looked_up)})
+
+                for i, output in zip(missing, looked_up):
+                    outputs[i] = output
+
+            return outputs
+
+    def to_plain(self, output: list[Token]) -> list[dict]:
+        """Lookup result as json without loaded senses / translations, so persisted results stay small"""
+        plain = []
+
+        for token in output:
+            token_dict = token.to_dict(exclude=("words",))
+            token_dict["words"] = [
+                word.to_dict(exclude=(word.lazy_key,)) if isinstance(word, LazyRecord) and word.loader else word.to_dict()
+                for word in token.words
+            ]
+            plain.append(token_dict)
+
+        return plain
+
+    def _lookup_many(self, texts: list[str], common: bool, mode: str, fuzzy: int) -> list[list[Token]]:
+        tokenized = [self._tokenize(text, mode) for text in texts]
+
+        # (table, surface) -> tuple of words, None if not found or MISSING until queried
+        words: dict[tuple[str, str], tuple[Word, ...] | None] = {}
+        names: dict[tuple[str, str], tuple[Name, ...] | None] = {}
+        word_surfaces = {"kanji": set(), "kana": set()}
+        name_surfaces = {"kanji": set(), "kana": set()}
+
+        for tokens in tokenized:
+            for _, pos, _, token in tokens:
+                if token is None or "助詞" in pos or not token.isalpha(): # ignore particles and punctuation
                     continue
 
-            words = [{
-                "id": word[0],
-                "tags": self._get_tags(word[1]),
-                "common": bool(word[2])
-            } for word in self.jmdict_cursor.execute(
-                f"SELECT word_id, tags, common FROM {table} WHERE text = ?",
-                (token,)
-            ).fetchall()]
-
-            if table == "kanji":
-                for word in words:
-                    word["reading"] = self.jmdict_cursor.execute(
-                        f"SELECT text FROM kana WHERE word_id = ?",
-                        (word["id"],)
-                    ).fetchone()[0]
-
-            for word in words:
-                senses = [
-                    {
-                        "id": info[0],
-                        "dialect": self._get_tags(info[1]),
-                        "misc": self._get_tags(info[2]),
-                        "info": info[3].replace("\n", "") if info[3] else None,
-                        "pos": self._get_tags(info[4]),
-                        "field": self._get_tags(info[5]),
-                        "gloss": []
-                    } for info in self.jmdict_cursor.execute(
-                        f"SELECT id, dialect, misc, info, pos, field FROM senses WHERE word_id = ?",
-                        (word["id"],)
-                    ).fetchall()
-                ]
-
-                for sense in senses:
-                    for gloss in self.jmdict_cursor.execute(
-                        f"SELECT gender, text, lang FROM glossary WHERE sense_id = ?",
-                        (sense["id"],)
-                    ).fetchall():
-                        sense["gloss"].append({
-                            "gender": gloss[0],
-                            "text": gloss[1],
-                            "lang": gloss[2]
-                        })
-
-                word["senses"] = senses
-
-            if words:
-                output.append({
-                    "text": token,
-                    "pos": parts_of_speech,
-                    "type": "word",
-                    "words": [word for word in words if word["common"] or not common]
-                })
-                continue
+                table = "kanji" if kanji.intersection(set(token)) else "kana"
+
+                if (table, token) not in words:
+                    words[(table, token)] = self.cache.get((token, table, common))
+
+                    if words[(table, token)] is MISSING:
+                        word_surfaces[table].add(token)
+
+                # the trie can't tell names apart, so they're a fallback for tokens jmdict doesn't know
+                if ("人名" in pos or mode == "trie") and (table, token) not in names:
+                    names[(table, token)] = self.cache.get((token, table, None))
+
+                    if names[(table, token)] is MISSING:
+                        name_surfaces[table].add(token)
+
+        if any(word_surfaces.values()):
+            found = self._lookup_words(word_surfaces)
+
+            for table, texts in word_surfaces.items():
+                for token in texts:
+                    entries = found.get((table, token))
+
+                    if entries is not None:
+                        entries = tuple(word for word in entries if word.common or not common)
+
+                    words[(table, token)] = entries
+                    self.cache.put((token, table, common), entries)
+
+        if any(name_surfaces.values()):
+            found = self._lookup_names(name_surfaces)
+
+            for table, texts in name_surfaces.items():
+                for token in texts:
+                    entries = found.get((table, token))
+                    names[(table, token)] = tuple(entries) if entries is not None else None
+                    self.cache.put((token, table, None), names[(table, token)])
+
+        # (table, surface) -> closest headword for kanji words that weren't found
+        corrections: dict[tuple[str, str], tuple[str, str]] = {}
+
+        if fuzzy > 0:
+            correction_surfaces = {"kanji": set(), "kana": set()}
+
+            for (table, token), entries in words.items():
+                if entries is not None or table != "kanji" or len(token) < 2 or names.get((table, token)):
+                    continue
+
+                candidates = self.fuzzy_lookup(token, fuzzy, limit=1)
+
+                if candidates:
+                    headword = candidates[0][0]
+                    headword_table = "kanji" if kanji.intersection(set(headword)) else "kana"
+                    corrections[(table, token)] = (headword_table, headword)
+                    correction_surfaces[headword_table].add(headword)
+
+            if corrections:
+                found = self._lookup_words(correction_surfaces)
+
+                for headword_table, headword in set(corrections.values()):
+                    entries = tuple(word for word in found.get((headword_table, headword), ()) if word.common or not common)
+                    words[(headword_table, headword)] = entries
+                    self.cache.put((headword, headword_table, common), entries)
+
+        outputs = []
+
+        for tokens in tokenized:
+            output = []
+
+            for surface, pos, parts_of_speech, token in tokens:
+                parts_of_speech = tuple(parts_of_speech)
+
+                if token is None or "助詞" in pos or not token.isalpha():
+                    output.append(Token(surface, parts_of_speech))
+                    continue
+
+                table = "kanji" if kanji.intersection(set(token)) else "kana"
+
+                # the cached words are copied, hydrating a result would otherwise grow the cache past its size
+                if (
+                    ("人名" in pos or mode == "trie" and words[(table, token)] is None)
+                    and names[(table, token)] is not None
+                ): # name
+                    output.append(Token(surface, parts_of_speech, "name", _copy_words(names[(table, token)])))
+                    continue
+
+                if words[(table, token)] is not None:
+                    output.append(Token(surface, parts_of_speech, "word", _copy_words(words[(table, token)])))
+                    continue
+
+                if (table, token) in corrections:
+                    output.append(Token(
+                        surface,
+                        parts_of_speech,
+                        "word",
+                        _copy_words(words[corrections[(table, token)]]),
+                        corrections[(table, token)][1]
+                    ))
+                    continue
+
+                output.append(Token(surface, parts_of_speech))
+
+            outputs.append(output)
+
+        return outputs
+
+
+# bumped whenever the dictionary schema changes, stored in PRAGMA user_version
+SCHEMA_VERSION = 5
+
+JMDICT_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS "kanji_text" ON "kanji" ("text", "word_id", "tags", "common")',
+    'CREATE INDEX IF NOT EXISTS "kana_text" ON "kana" ("text", "word_id", "tags", "common")',
+    'CREATE INDEX IF NOT EXISTS "kana_word_id" ON "kana" ("word_id", "text")',
+    'CREATE INDEX IF NOT EXISTS "senses_word_id" ON "senses" ("word_id")',
+    'CREATE INDEX IF NOT EXISTS "glossary_sense_id" ON "glossary" ("sense_id", "gender", "text", "lang")'
+)
+
+JMNEDICT_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS "kanji_text" ON "kanji" ("text", "word_id", "tags")',
+    'CREATE INDEX IF NOT EXISTS "kana_text" ON "kana" ("text", "word_id", "tags")',
+    'CREATE INDEX IF NOT EXISTS "kana_word_id" ON "kana" ("word_id", "text")',
+    'CREATE INDEX IF NOT EXISTS "translations_word_id" ON "translations" ("word_id")'
+)
+
+
+def _has_table(connection: sqlite3.Connection, name: str) -> bool:
+    return bool(connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (name,)
+    ).fetchone())
+
+
+def _is_jmnedict(connection: sqlite3.Connection) -> bool:
+    return _has_table(connection, "translations")
+
 
-            output.append({"text": token, "pos": parts_of_speech, "type": None})
+def create_indexes(connection: sqlite3.Connection):
+    """Creates the lookup indexes for a jmdict or jmnedict database, should be run after bulk loading
 
-        return output
+    Args:
+        connection (sqlite3.Connection): Connection to the dictionary database.
+    """
+    for statement in JMNEDICT_INDEXES if _is_jmnedict(connection) else JMDICT_INDEXES:
+        connection.execute(statement)
 
+    connection.execute("ANALYZE")
+
+
+def _entry_data(cursor: sqlite3.Cursor, word_ids: set[int], name: bool) -> dict[int, dict]:
+    """Assembles entries from the normalized tables, in the format stored in the entries table"""
+    entries = {word_id: {"readings": []} for word_id in word_ids}
+
+    for word_id, text in JMDict._select_in(
+        cursor,
+        "SELECT word_id, text FROM kana WHERE word_id IN ({}) ORDER BY id",
+        list(word_ids)
+    ):
+        entries[word_id]["readings"].append(text)
+
+    if name:
+        translations = JMDict.fetch_translations(cursor, word_ids)
+
+        for word_id, entry in entries.items():
+            entry["translations"] = [translation.to_dict() for translation in translations.get(word_id, [])]
+    else:
+        senses = JMDict.fetch_senses(cursor, word_ids)
+
+        for word_id, entry in entries.items():
+            entry["senses"] = [sense.to_dict() for sense in senses.get(word_id, [])]
+
+    return entries
+
+
+def _word_ids(cursor: sqlite3.Cursor) -> list[int]:
+    return [row[0] for row in cursor.execute(
+        "SELECT word_id FROM kanji UNION SELECT word_id FROM kana ORDER BY word_id"
+    ).fetchall()]
+
+
+def build_entries(connection: sqlite3.Connection):
+    """(Re)builds the entries table, one pre-serialized entry per word so lookups read a single row
+
+    Args:
+        connection (sqlite3.Connection): Connection to the dictionary database, indexes should already exist.
+    """
+    cursor = connection.cursor()
+    name = _is_jmnedict(connection)
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS "entries" (
+	"word_id" INTEGER NOT NULL UNIQUE,
+	"data" TEXT NOT NULL,
+	PRIMARY KEY("word_id")
+);""")
+    cursor.execute("DELETE FROM entries")
+    _insert_entries(cursor, _word_ids(cursor), name)
+
+
+def _insert_entries(cursor: sqlite3.Cursor, word_ids: list[int], name: bool):
+    for chunk in _chunks(word_ids):
+        cursor.executemany(
+            "INSERT INTO entries (word_id, data) VALUES (?, ?)",
+            [
+                (word_id, ujson.dumps(entry, ensure_ascii=False))
+                for word_id, entry in _entry_data(cursor, set(chunk), name).items()
+            ]
+        )
+
+
+def check_entries(path: str) -> list[int]:
+    """Checks that every entry in the entries table matches the normalized tables
+
+    Args:
+        path (str): Path to the dictionary database.
+
+    Returns:
+        list[int]: Ids of missing, stale or orphaned entries, empty if the table is consistent.
+    """
+    connection = sqlite3.connect(path)
+    cursor = connection.cursor()
+    name = _is_jmnedict(connection)
+    word_ids = _word_ids(cursor)
+    mismatched = []
+
+    for chunk in _chunks(word_ids):
+        expected = _entry_data(cursor, set(chunk), name)
+        stored = JMDict.fetch_entries(cursor, set(chunk))
+
+        mismatched.extend(word_id for word_id in chunk if stored.get(word_id) != expected[word_id])
+
+    mismatched.extend(
+        row[0] for row in cursor.execute(
+            "SELECT word_id FROM entries WHERE word_id NOT IN (SELECT word_id FROM kanji UNION SELECT word_id FROM kana)"
+        ).fetchall()
+    )
+    connection.close()
+
+    return mismatched
+
+
+def build_ngrams(connection: sqlite3.Connection):
+    """(Re)builds the bigram index over every headword used by `JMDict.fuzzy_lookup`
+
+    Args:
+        connection (sqlite3.Connection): Connection to the dictionary database.
+    """
+    cursor = connection.cursor()
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS "ngrams" (
+	"gram" TEXT NOT NULL,
+	"length" INTEGER NOT NULL,
+	"text" TEXT NOT NULL,
+	PRIMARY KEY("gram", "length", "text")
+) WITHOUT ROWID;""")
+    cursor.execute("DELETE FROM ngrams")
+
+    headwords = [row[0] for row in cursor.execute(
+        "SELECT text FROM kanji WHERE text IS NOT NULL UNION SELECT text FROM kana WHERE text IS NOT NULL"
+    ).fetchall()]
+    _insert_ngrams(cursor, headwords)
+
+
+def _insert_ngrams(cursor: sqlite3.Cursor, headwords: list[str]):
+    for chunk in _chunks(headwords, BUILD_BATCH_SIZE):
+        cursor.executemany(
+            "INSERT INTO ngrams (gram, length, text) VALUES (?, ?, ?)",
+            [(gram, len(text), text) for text in chunk for gram in bigrams(text)]
+        )
+
+
+def build_gloss_fts(connection: sqlite3.Connection):
+    """(Re)builds the full-text index over glossary text used by `JMDict.search_gloss`, jmnedict is skipped
+
+    Args:
+        connection (sqlite3.Connection): Connection to the dictionary database.
+    """
+    if _is_jmnedict(connection):
+        return
+
+    # external content table, the text itself stays in glossary. lang is indexed so it can be part of MATCH
+    connection.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS glossary_fts "
+        "USING fts5(text, lang, content='glossary', content_rowid='id', prefix='2 3')"
+    )
+    connection.execute("INSERT INTO glossary_fts(glossary_fts) VALUES ('rebuild')")
+
+
+def entry_hash(text: str) -> bytes:
+    """Content hash of an entry's json text, used to find the entries that changed between releases
+
+    Releases are generated the same way every time, so the text only changes when the entry does.
+    """
+    return blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def create_entry_hashes(connection: sqlite3.Connection):
+    """Creates the per-entry hash table used by `update_dictionary`
+
+    Databases migrated from older versions start without hashes, their first update rewrites every entry once.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the dictionary database.
+    """
+    connection.execute("""CREATE TABLE IF NOT EXISTS "entry_hashes" (
+	"word_id" INTEGER NOT NULL,
+	"hash" BLOB NOT NULL,
+	PRIMARY KEY("word_id")
+);""")
+
+
+def build_accents(connection: sqlite3.Connection, path: str) -> int:
+    """(Re)builds the accents table, linking the pitch accents of accents.txt to the jmdict readings they belong to
+
+    A (word, reading) pair matches the kana rows with that reading whose word is written as `word`, or for kana
+    words the kana rows spelled `word` of words without kanji. Homographs only get the accents of their own reading
+    and homophones don't get each other's. The precompiled rows are kept in accent_readings, `update_dictionary`
+    links the words it rewrites from there.
+
+    Args:
+        connection (sqlite3.Connection): Connection to a jmdict database, indexes should already exist.
+        path (str): Path to accents.txt (word, reading and comma separated accents, tab separated).
+
+    Returns:
+        int: The number of patterns linked to a reading.
+    """
+    cursor = connection.cursor()
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS "accent_readings" (
+	"id" INTEGER NOT NULL UNIQUE,
+	"word" TEXT NOT NULL,
+	"reading" TEXT NOT NULL,
+	"morae" TEXT NOT NULL,
+	"pattern" INTEGER NOT NULL,
+	PRIMARY KEY("id")
+);""")
+    cursor.execute("""CREATE TABLE IF NOT EXISTS "accents" (
+	"id" INTEGER NOT NULL UNIQUE,
+	"kana_id" INTEGER NOT NULL,
+	"word_id" INTEGER NOT NULL,
+	"morae" TEXT NOT NULL,
+	"pattern" INTEGER NOT NULL,
+	PRIMARY KEY("id"),
+	UNIQUE("kana_id", "pattern")
+);""")
+    cursor.execute("DELETE FROM accent_readings")
+    cursor.execute("DELETE FROM accents")
+
+    cursor.executemany(
+        "INSERT INTO accent_readings (word, reading, morae, pattern) VALUES (?, ?, ?, ?)",
+        ((word, reading, morae, pattern) for word, reading, _, morae, pattern in accent_rows(read_accents(path)))
+    )
+    cursor.execute('CREATE INDEX IF NOT EXISTS "accent_readings_reading" ON "accent_readings" ("reading")')
+    cursor.execute('CREATE INDEX IF NOT EXISTS "accent_readings_word" ON "accent_readings" ("word")')
+    cursor.execute('CREATE INDEX IF NOT EXISTS "accents_word_id" ON "accents" ("word_id")')
+
+    return _link_accents(cursor)
+
+
+def _link_accents(cursor: sqlite3.Cursor, word_ids: list[int] | None = None) -> int:
+    """Links accent_readings to kana rows, of every word or only the given ones"""
+    query = """INSERT OR IGNORE INTO accents (kana_id, word_id, morae, pattern)
+    SELECT kana_id, word_id, morae, pattern FROM (
+        SELECT kana.id AS kana_id, kana.word_id, a.morae, a.pattern, a.id AS line FROM accent_readings a
+        JOIN kana ON kana.text = a.reading
+        JOIN kanji ON kanji.word_id = kana.word_id AND kanji.text = a.word {0}
+        UNION ALL
+        SELECT kana.id, kana.word_id, a.morae, a.pattern, a.id FROM accent_readings a
+        JOIN kana ON kana.text = a.word
+        WHERE NOT EXISTS (SELECT 1 FROM kanji WHERE kanji.word_id = kana.word_id AND kanji.text IS NOT NULL) {1}
+    ) ORDER BY line"""
+
+    if word_ids is None:
+        return cursor.execute(query.format("", "")).rowcount
+
+    rows = 0
+
+    for chunk in _chunks(word_ids, MAX_PARAMS // 2): # the placeholders appear twice
+        placeholders = ", ".join("?" * len(chunk))
+        rows += cursor.execute(
+            query.format(f"WHERE kana.word_id IN ({placeholders})", f"AND kana.word_id IN ({placeholders})"),
+            chunk + chunk
+        ).rowcount
+
+    return rows
+
+
+def _replace_database(db_path: str, change):
+    """Runs `change` on a copy of a database, then swaps the copy in
+
+    `JMDict` reads with immutable=1, without any locking, so a database it may have open is never changed in place.
+    Open `JMDict` instances keep reading the old file until they notice the new one and drop their caches. Where an
+    open database can't be replaced (Windows), the app has to be closed first.
+
+    Args:
+        db_path (str): Path to the database.
+        change: Function called with the copy's path, its return value is returned.
+
+    Raises:
+        RuntimeError: If the database is in use and can't be replaced, it's left as it was.
+    """
+    copy_path = f"{db_path}.update"
+    shutil.copyfile(db_path, copy_path)
+
+    try:
+        result = change(copy_path)
+
+        try:
+            os.replace(copy_path, db_path)
+        except PermissionError as e:
+            raise RuntimeError(f"{db_path} is in use, close MangaSeer and try again") from e
+    finally:
+        if os.path.exists(copy_path):
+            os.remove(copy_path)
+
+    return result
+
+
+def link_accents(path: str, db_path: str = "jmdict.db") -> int:
+    """Builds the accents table of an existing jmdict database, see `build_accents`
+
+    The database is changed through a copy, see `_replace_database`.
+
+    Args:
+        path (str): Path to accents.txt.
+        db_path (str, optional): Path to the jmdict database. Defaults to "jmdict.db".
+
+    Raises:
+        ValueError: If it's a jmnedict database.
+        RuntimeError: If the database is in use and can't be replaced.
+
+    Returns:
+        int: The number of patterns linked to a reading.
+    """
+    connection = sqlite3.connect(db_path)
+    is_jmnedict = _is_jmnedict(connection)
+    connection.close()
+
+    if is_jmnedict:
+        raise ValueError(f"{db_path} is a jmnedict database, accents are linked to jmdict")
+
+    return _replace_database(db_path, lambda copy_path: _link_accents_in_place(path, copy_path))
+
+
+def _link_accents_in_place(path: str, db_path: str) -> int:
+    connection = sqlite3.connect(db_path)
+
+    with connection:
+        rows = build_accents(connection, path)
+        connection.execute("ANALYZE")
+
+    connection.close()
+
+    return rows
+
+
+# migrations[n] upgrades a database from schema version n - 1 to n
+migrations = {
+    1: create_indexes,
+    2: build_entries,
+    3: build_ngrams,
+    4: build_gloss_fts,
+    5: create_entry_hashes
+}
+
+
+def get_schema_version(connection: sqlite3.Connection) -> int:
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate_database(path: str) -> tuple[int, int]:
+    """Upgrades an existing jmdict.db / jmnedict.db to the current schema version
+
+    The database is only copied if it's behind, the migrations run on the copy, see `_replace_database`.
+
+    Args:
+        path (str): Path to the dictionary database.
+
+    Raises:
+        RuntimeError: If the database is in use and can't be replaced.
+
+    Returns:
+        tuple[int, int]: The schema version before and after migrating.
+    """
+    connection = sqlite3.connect(path)
+    version = get_schema_version(connection)
+    connection.close()
+
+    if version >= SCHEMA_VERSION:
+        return version, version
+
+    return _replace_database(path, _migrate_in_place)
+
+
+def _migrate_in_place(path: str) -> tuple[int, int]:
+    connection = sqlite3.connect(path)
+    old_version = version = get_schema_version(connection)
+
+    while version < SCHEMA_VERSION:
+        version += 1
+        migrations[version](connection)
+        connection.execute(f"PRAGMA user_version = {version}")
+        connection.commit()
+
+    connection.close()
+
+    return old_version, version
+
+
+# build-time only, a crashed build just needs to be re-run
+BUILD_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -524288" # 512 MiB
+)
+
+# number of words buffered before each executemany
+BUILD_BATCH_SIZE = 5000
+
+
+def iter_json_array(path: str, key: str = "words", chunk_size: int = 1 << 20, raw: bool = False):
+    """Streams the items of a top-level json array without loading the whole file
+
+    Args:
+        path (str): Path to the json file (e.g. jmdict-eng-3.5.0.json).
+        key (str, optional): Key of the array in the top-level object. Defaults to "words".
+        chunk_size (int, optional): Number of characters read at a time. Defaults to 1 MiB.
+        raw (bool, optional): Also yield the json text of each item. Defaults to False.
+
+    Yields:
+        dict | tuple[dict, str]: Each item of the array in order, with its json text if `raw`.
+    """
+    decoder = JSONDecoder()
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
 
-def generate_jmdict_sqlite(path: str):
     with open(path, "r", encoding="utf-8") as f:
-        jmdict_json: dict = ujson.load(f)
-    
-    connection = sqlite3.connect("jmdict.db")
+        buffer = ""
+
+        while True: # find the start of the array
+            chunk = f.read(chunk_size)
+
+            if not chunk:
+                raise ValueError(f"{path} has no top-level {key!r} array")
+
+            buffer += chunk
+            match = start.search(buffer)
+
+            if match:
+                buffer = buffer[match.end():]
+                break
+
+            buffer = buffer[-len(key) - 8:] # keep enough to match a key split across chunks
+
+        position = 0
+        eof = False
+
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+
+            if position < len(buffer) and buffer[position] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except JSONDecodeError:
+                if eof:
+                    raise
+
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            # the item could end exactly at the chunk boundary with more digits/characters to come
+            if end == len(buffer) and not eof:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            yield (item, buffer[position:end]) if raw else item
+            position = end
+
+
+def _open_build(db_path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(db_path)
+
+    for pragma in BUILD_PRAGMAS:
+        connection.execute(pragma)
+
+    return connection
+
+
+def set_build_options(connection: sqlite3.Connection, **options):
+    """Records how a database was pruned at build time, so later updates can prune the same way"""
+    connection.execute('CREATE TABLE IF NOT EXISTS "build_options" ("key" TEXT PRIMARY KEY, "value" TEXT)')
+    connection.executemany(
+        "INSERT OR REPLACE INTO build_options (key, value) VALUES (?, ?)",
+        [(key, ujson.dumps(value)) for key, value in options.items()]
+    )
+
+
+def get_build_options(connection: sqlite3.Connection) -> dict:
+    """Returns the options a database was built with, empty for unpruned (or older) databases"""
+    if not _has_table(connection, "build_options"):
+        return {}
+
+    return {key: ujson.loads(value) for key, value in connection.execute("SELECT key, value FROM build_options")}
+
+
+def _jmdict_rows(word: dict, languages: set[str] | None, common_only: bool) -> tuple[list, list, list] | None:
+    """Splits a jmdict-simplified word into kanji rows, kana rows and (sense row, gloss rows) pairs
+
+    Senses without a gloss in `languages` are dropped. Returns None if nothing of the word is kept.
+    """
+    word_id = int(word["id"])
+    kanji_entries = [kanji for kanji in word["kanji"] if kanji["common"] or not common_only]
+
+    # kana are kept as they are, they're also where the readings of the kept kanji come from
+    if common_only and not kanji_entries and not any(kana["common"] for kana in word["kana"]):
+        return None
+
+    senses = []
+
+    for sense in word["sense"]:
+        glosses = [
+            (gloss["gender"], gloss["text"], gloss["lang"])
+            for gloss in sense["gloss"] if languages is None or gloss["lang"] in languages
+        ]
+
+        if glosses:
+            senses.append(((
+                word_id,
+                ",".join(sense["field"]),
+                ",".join(sense["dialect"]),
+                ",".join(sense["misc"]),
+                "\n".join(sense["info"]),
+                ",".join(sense["partOfSpeech"])
+            ), glosses))
+
+    if not senses:
+        return None
+
+    return (
+        [(word_id, kanji["text"], ",".join(kanji["tags"]), int(kanji["common"])) for kanji in kanji_entries],
+        [(word_id, kana["text"], ",".join(kana["tags"]), int(kana["common"])) for kana in word["kana"]],
+        senses
+    )
+
+
+def _insert_jmdict_rows(cursor: sqlite3.Cursor, words: list[tuple], sense_id: int) -> tuple[int, int]:
+    """Bulk inserts words made by `_jmdict_rows`, numbering senses after `sense_id`
+
+    Returns:
+        tuple[int, int]: The number of rows inserted and the last sense id used.
+    """
+    kanji_rows, kana_rows, sense_rows, gloss_rows = [], [], [], []
+
+    for kanji, kana, senses in words:
+        kanji_rows.extend(kanji)
+        kana_rows.extend(kana)
+
+        for sense, glosses in senses:
+            sense_id += 1
+            sense_rows.append((sense_id, *sense))
+            gloss_rows.extend((sense_id, *gloss) for gloss in glosses)
+
+    cursor.executemany("INSERT INTO kanji (word_id, text, tags, common) VALUES (?, ?, ?, ?)", kanji_rows)
+    cursor.executemany("INSERT INTO kana (word_id, text, tags, common) VALUES (?, ?, ?, ?)", kana_rows)
+    cursor.executemany(
+        "INSERT INTO senses (id, word_id, field, dialect, misc, info, pos) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        sense_rows
+    )
+    cursor.executemany("INSERT INTO glossary (sense_id, gender, text, lang) VALUES (?, ?, ?, ?)", gloss_rows)
+
+    return len(kanji_rows) + len(kana_rows) + len(sense_rows) + len(gloss_rows), sense_id
+
+
+def _jmnedict_rows(word: dict, languages: set[str] | None) -> tuple[list, list, list] | None:
+    """Splits a jmnedict word into kanji, kana and translation rows, None if no translation is kept"""
+    word_id = int(word["id"])
+    translations = []
+
+    for translation in word["translation"]:
+        texts = [t["text"] for t in translation["translation"] if languages is None or t["lang"] in languages]
+
+        if texts:
+            translations.append((word_id, ",".join(translation["type"]), "\n".join(texts)))
+
+    if not translations:
+        return None
+
+    return (
+        [(word_id, kanji["text"], ",".join(kanji["tags"])) for kanji in word["kanji"]],
+        [(word_id, kana["text"], ",".join(kana["tags"])) for kana in word["kana"]],
+        translations
+    )
+
+
+def _insert_jmnedict_rows(cursor: sqlite3.Cursor, words: list[tuple]) -> int:
+    kanji_rows = [row for kanji, _, _ in words for row in kanji]
+    kana_rows = [row for _, kana, _ in words for row in kana]
+    translation_rows = [row for _, _, translations in words for row in translations]
+
+    cursor.executemany("INSERT INTO kanji (word_id, text, tags) VALUES (?, ?, ?)", kanji_rows)
+    cursor.executemany("INSERT INTO kana (word_id, text, tags) VALUES (?, ?, ?)", kana_rows)
+    cursor.executemany("INSERT INTO translations (word_id, type, text) VALUES (?, ?, ?)", translation_rows)
+
+    return len(kanji_rows) + len(kana_rows) + len(translation_rows)
+
+
+def _finish_build(connection: sqlite3.Connection, db_path: str, rows: int, start: float) -> int:
+    create_indexes(connection)
+    build_entries(connection)
+    build_ngrams(connection)
+    build_gloss_fts(connection)
+    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    connection.commit()
+    connection.close()
+
+    elapsed = perf_counter() - start
+    print(f"{db_path}: {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)")
+
+    return rows
+
+
+def generate_jmdict_sqlite(
+    path: str, db_path: str = "jmdict.db", languages: list[str] | None = None, common_only: bool = False
+) -> int:
+    """Builds the jmdict database from a jmdict-simplified json release
+
+    The json is streamed, rows are bulk inserted in a single transaction and indexes are created last.
+    Senses without a gloss in `languages` are dropped, and so are words left without any sense.
+
+    Args:
+        path (str): Path to the jmdict-simplified json file.
+        db_path (str, optional): Path of the database to build. Defaults to "jmdict.db".
+        languages (list[str] | None, optional): Gloss languages to keep, e.g. ["eng"]. Defaults to None (all).
+        common_only (bool, optional): Only keep common words and their common kanji, what `lookup(common=True)`
+            returns anyway. Defaults to False.
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    start = perf_counter()
+    connection = _open_build(db_path)
     cursor = connection.cursor()
     cursor.execute("""CREATE TABLE IF NOT EXISTS "kanji" (
 	"id" INTEGER NOT NULL UNIQUE,
@@ -213,65 +1563,56 @@ def generate_jmdict_sqlite(path: str):
 	PRIMARY KEY("id")
 );""")
 
-    for word in jmdict_json["words"]:
-        word_id = int(word["id"])
+    create_entry_hashes(connection)
+    languages = set(languages) if languages else None
+    set_build_options(connection, languages=sorted(languages) if languages else None, common_only=common_only)
 
-        for kanji in word["kanji"]:
-            cursor.execute(
-                "INSERT INTO kanji (word_id, text, tags, common) VALUES (?, ?, ?, ?)",
-                (
-                    word_id,
-                    kanji["text"],
-                    ",".join(kanji["tags"]),
-                    int(kanji["common"])
-                )
-            )
+    # sense ids are assigned here instead of asking sqlite for last_insert_rowid() after every sense
+    sense_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM senses").fetchone()[0]
+    words, hash_rows = [], []
+    rows = 0
 
-        for kana in word["kana"]:
-            cursor.execute(
-                "INSERT INTO kana (word_id, text, tags, common) VALUES (?, ?, ?, ?)",
-                (
-                    word_id,
-                    kana["text"],
-                    ",".join(kana["tags"]),
-                    int(kana["common"])
-                )
-            )
+    def flush():
+        nonlocal rows, sense_id
 
-        for sense in word["sense"]:
-            cursor.execute(
-                "INSERT INTO senses (word_id, field, dialect, misc, info, pos) VALUES (?, ?, ?, ?, ?, ?)",
-                (
-                    word_id,
-                    ",".join(sense["field"]),
-                    ",".join(sense["dialect"]),
-                    ",".join(sense["misc"]),
-                    "\n".join(sense["info"]),
-                    ",".join(sense["partOfSpeech"])
-                )
-            )
+        inserted, sense_id = _insert_jmdict_rows(cursor, words, sense_id)
+        cursor.executemany("INSERT INTO entry_hashes (word_id, hash) VALUES (?, ?)", hash_rows)
+        rows += inserted
 
-            sense_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        words.clear()
+        hash_rows.clear()
 
-            for gloss in sense["gloss"]:
-                cursor.execute(
-                    "INSERT INTO glossary (sense_id, gender, text, lang) VALUES (?, ?, ?, ?)",
-                    (
-                        sense_id,
-                        gloss["gender"],
-                        gloss["text"],
-                        gloss["lang"]
-                    )
-                )
+    for i, (word, text) in enumerate(iter_json_array(path, "words", raw=True), 1):
+        if i % BUILD_BATCH_SIZE == 0:
+            flush()
 
-        connection.commit()
+        # pruned words are hashed too, so updates don't have to look at them again
+        hash_rows.append((int(word["id"]), entry_hash(text)))
+        word_rows = _jmdict_rows(word, languages, common_only)
 
+        if word_rows:
+            words.append(word_rows)
 
-def generate_jmnedict_sqlite(path: str):
-    with open(path, "r", encoding="utf-8") as f:
-        jmnedict_json: dict = ujson.load(f)
-    
-    connection = sqlite3.connect("jmnedict.db")
+    flush()
+
+    return _finish_build(connection, db_path, rows, start)
+
+
+def generate_jmnedict_sqlite(path: str, db_path: str = "jmnedict.db", languages: list[str] | None = None) -> int:
+    """Builds the jmnedict database from a jmdict-simplified json release
+
+    The json is streamed, rows are bulk inserted in a single transaction and indexes are created last.
+
+    Args:
+        path (str): Path to the jmnedict json file.
+        db_path (str, optional): Path of the database to build. Defaults to "jmnedict.db".
+        languages (list[str] | None, optional): Translation languages to keep. Defaults to None (all).
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    start = perf_counter()
+    connection = _open_build(db_path)
     cursor = connection.cursor()
     cursor.execute("""CREATE TABLE IF NOT EXISTS "kana" (
 	"id" INTEGER NOT NULL UNIQUE,
@@ -297,40 +1638,224 @@ def generate_jmnedict_sqlite(path: str):
 	PRIMARY KEY("id")	
 );""")
 
-    for word in jmnedict_json["words"]:
+    create_entry_hashes(connection)
+    languages = set(languages) if languages else None
+    set_build_options(connection, languages=sorted(languages) if languages else None)
+
+    words, hash_rows = [], []
+    rows = 0
+
+    def flush():
+        nonlocal rows
+
+        rows += _insert_jmnedict_rows(cursor, words)
+        cursor.executemany("INSERT INTO entry_hashes (word_id, hash) VALUES (?, ?)", hash_rows)
+
+        words.clear()
+        hash_rows.clear()
+
+    for i, (word, text) in enumerate(iter_json_array(path, "words", raw=True), 1):
+        if i % BUILD_BATCH_SIZE == 0:
+            flush()
+
+        hash_rows.append((int(word["id"]), entry_hash(text)))
+        word_rows = _jmnedict_rows(word, languages)
+
+        if word_rows:
+            words.append(word_rows)
+
+    flush()
+
+    return _finish_build(connection, db_path, rows, start)
+
+
+def update_dictionary(path: str, db_path: str) -> dict[str, int]:
+    """Applies a newer jmdict / jmnedict release to an existing database without rebuilding it
+
+    Entries are compared by word id and content hash, only inserted, changed and removed words are rewritten,
+    together with their entries, ngrams, full-text rows and linked accents. The database is pruned the same way it
+    was built.
+
+    The update is applied to a copy, which replaces the database once it's complete, see `_replace_database`.
+    Compiled dictionaries and headword files have to be recompiled.
+
+    Args:
+        path (str): Path to the new json release.
+        db_path (str): Path to the database to update, migrated to the current schema first.
+
+    Raises:
+        RuntimeError: If the database is in use and can't be replaced, it's left as it was.
+
+    Returns:
+        dict[str, int]: Number of inserted, updated, deleted and unchanged words.
+    """
+    start = perf_counter()
+    counts = _replace_database(db_path, lambda update_path: _apply_update(path, update_path))
+    print(f"{db_path}: {counts} in {perf_counter() - start:.1f}s")
+
+    return counts
+
+
+def _apply_update(path: str, db_path: str) -> dict[str, int]:
+    """Does the work of `update_dictionary` in place, on a database nothing is reading from"""
+    _migrate_in_place(db_path)
+
+    connection = sqlite3.connect(db_path)
+    cursor = connection.cursor()
+    name = _is_jmnedict(connection)
+    options = get_build_options(connection)
+    languages = set(options["languages"]) if options.get("languages") else None
+    has_accents = _has_table(connection, "accents")
+
+    hashes = dict(cursor.execute("SELECT word_id, hash FROM entry_hashes").fetchall())
+    known = set(hashes).union(_word_ids(cursor)) # databases without hashes yet
+    changed: dict[int, tuple[bytes, dict]] = {}
+    seen = set()
+
+    for word, text in iter_json_array(path, "words", raw=True):
         word_id = int(word["id"])
+        digest = entry_hash(text)
+        seen.add(word_id)
 
-        for kanji in word["kanji"]:
-            cursor.execute(
-                "INSERT INTO kanji (word_id, text, tags) VALUES (?, ?, ?)",
-                (
-                    word_id,
-                    kanji["text"],
-                    ",".join(kanji["tags"])
-                )
+        if hashes.get(word_id) != digest:
+            changed[word_id] = (digest, word)
+
+    deleted = known - seen
+    affected = list(set(changed) | deleted)
+
+    with connection:
+        headwords = set()
+
+        for table in ("kanji", "kana"):
+            headwords.update(
+                text for (text,) in JMDict._select_in(cursor, f"SELECT text FROM {table} WHERE word_id IN ({{}})", affected)
             )
 
-        for kana in word["kana"]:
-            cursor.execute(
-                "INSERT INTO kana (word_id, text, tags) VALUES (?, ?, ?)",
-                (
-                    word_id,
-                    kana["text"],
-                    ",".join(kana["tags"])
-                )
+        if name:
+            JMDict._select_in(cursor, "DELETE FROM translations WHERE word_id IN ({})", affected)
+        else:
+            # external content fts has to be told the old text before the rows disappear
+            JMDict._select_in(
+                cursor,
+                """INSERT INTO glossary_fts (glossary_fts, rowid, text, lang)
+                SELECT 'delete', glossary.id, glossary.text, glossary.lang FROM glossary
+                JOIN senses ON senses.id = glossary.sense_id WHERE senses.word_id IN ({})""",
+                affected
             )
+            JMDict._select_in(
+                cursor,
+                "DELETE FROM glossary WHERE sense_id IN (SELECT id FROM senses WHERE word_id IN ({}))",
+                affected
+            )
+            JMDict._select_in(cursor, "DELETE FROM senses WHERE word_id IN ({})", affected)
+
+        for table in ("kanji", "kana", "entries", "entry_hashes") + (("accents",) if has_accents else ()):
+            JMDict._select_in(cursor, f"DELETE FROM {table} WHERE word_id IN ({{}})", affected)
+
+        sense_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM senses").fetchone()[0] if not name else 0
+        last_gloss_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM glossary").fetchone()[0] if not name else 0
+        words = []
+        kept = set()
+
+        for word_id, (_, word) in changed.items():
+            if name:
+                word_rows = _jmnedict_rows(word, languages)
+            else:
+                word_rows = _jmdict_rows(word, languages, options.get("common_only", False))
+
+            if word_rows:
+                words.append(word_rows)
+                kept.add(word_id)
+                headwords.update(row[1] for row in word_rows[0] + word_rows[1])
+
+        for chunk in _chunks(words, BUILD_BATCH_SIZE):
+            if name:
+                _insert_jmnedict_rows(cursor, chunk)
+            else:
+                _, sense_id = _insert_jmdict_rows(cursor, chunk, sense_id)
 
-        for translation in word["translation"]:
+        if not name:
             cursor.execute(
-                "INSERT INTO translations (word_id, type, text) VALUES (?, ?, ?)",
-                (
-                    word_id,
-                    ",".join(translation["type"]),
-                    "\n".join([t["text"] for t in translation["translation"]])
-                )
+                "INSERT INTO glossary_fts (rowid, text, lang) SELECT id, text, lang FROM glossary WHERE id > ?",
+                (last_gloss_id,)
             )
 
-        connection.commit()
+        _insert_entries(cursor, sorted(kept), name)
+
+        if has_accents: # kana rows were replaced, link them again
+            _link_accents(cursor, sorted(kept))
+
+        cursor.executemany(
+            "INSERT INTO entry_hashes (word_id, hash) VALUES (?, ?)",
+            [(word_id, digest) for word_id, (digest, _) in changed.items()]
+        )
+
+        # headwords can be shared between words, ngrams are added back for the ones some word still uses
+        headwords.discard(None)
+        headwords = list(headwords)
+        JMDict._select_in(cursor, "DELETE FROM ngrams WHERE text IN ({})", headwords)
+
+        remaining = set()
+
+        for table in ("kanji", "kana"):
+            remaining.update(
+                text for (text,) in JMDict._select_in(cursor, f"SELECT text FROM {table} WHERE text IN ({{}})", headwords)
+            )
+
+        _insert_ngrams(cursor, list(remaining))
+
+    connection.close()
+
+    return {
+        "inserted": len(set(changed) - known),
+        "updated": len(set(changed) & known),
+        "deleted": len(deleted),
+        "unchanged": len(seen) - len(changed)
+    }
+
+
+def compile_dictionary(db_path: str, out_path: str) -> int:
+    """Compiles a jmdict.db / jmnedict.db into a read-only file for `JMDict(backend="compiled")`
+
+    Args:
+        db_path (str): Path to the dictionary database.
+        out_path (str): Path of the compiled file to write.
+
+    Returns:
+        int: The number of headwords compiled.
+    """
+    connection = sqlite3.connect(db_path)
+    cursor = connection.cursor()
+    fetch = JMDict.fetch_names if _is_jmnedict(connection) else partial(
+        JMDict.fetch_words, accents=_has_table(connection, "accents")
+    )
+    has_entries = _has_table(connection, "entries")
+
+    keys = sorted(
+        (
+            (table, text)
+            for table in ("kanji", "kana")
+            for (text,) in cursor.execute(f"SELECT DISTINCT text FROM {table} WHERE text IS NOT NULL").fetchall()
+        ),
+        key=lambda key: encode_key(*key)
+    )
+
+    def entries():
+        for chunk in _chunks(keys):
+            surfaces = {"kanji": set(), "kana": set()}
+
+            for table, text in chunk:
+                surfaces[table].add(text)
+
+            words = fetch(cursor, surfaces, entries=has_entries)
+
+            for table, text in chunk:
+                yield table, text, [word.to_dict() for word in words[(table, text)]]
+
+    write_compiled_dictionary(out_path, entries())
+    connection.close()
+
+    return len(keys)
 
 
 if __name__ == "__main__":
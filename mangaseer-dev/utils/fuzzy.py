@@ -0,0 +1,38 @@
+def bigrams(text: str) -> set[str]:
+    """Character bigrams of the text padded with ^ and $, so single characters and word edges count too"""
+    padded = f"^{text}$"
+
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def min_shared_bigrams(length: int, max_distance: int) -> int:
+    """Lower bound of bigrams a word within `max_distance` edits must share with a word of `length` characters
+
+    Every edit changes at most two padded bigrams (the q-gram lemma), so candidates sharing fewer can be skipped.
+    """
+    return max(1, length + 1 - 2 * max_distance)
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Levenshtein distance between a and b, or max_distance + 1 once it's known to be larger"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+
+        if min(current) > max_distance:
+            return max_distance + 1
+
+        previous = current
+
+    return previous[-1]
@@ -0,0 +1,60 @@
+import traceback
+from queue import Queue
+from threading import Lock
+from PySide6 import QtCore
+
+
+class GlossSearcher(QtCore.QThread):
+    # request id from `search`, the query and its results
+    found = QtCore.Signal(int, str, object)
+
+    def __init__(self, jmdict, limit: int = 20):
+        """Runs `JMDict.search_gloss` in the background, so typing in the search box never waits for a query
+
+        Only the newest query is searched if several came in while one was running, callers should ignore results
+        whose request id isn't the last one they got from `search`.
+
+        Args:
+            jmdict (JMDict): The dictionary to search.
+            limit (int, optional): Maximum number of words per query. Defaults to 20.
+        """
+        super().__init__()
+
+        self.jmdict = jmdict
+        self.limit = limit
+        self.queries = Queue()
+        self._request = 0
+        self._lock = Lock()
+
+    def search(self, query: str) -> int:
+        """Queues a query, returns the request id its results will be emitted with"""
+        with self._lock:
+            self._request += 1
+            request = self._request
+
+        self.queries.put((request, query))
+
+        return request
+
+    def run(self):
+        while True:
+            request, query = self.queries.get()
+
+            # the user kept typing, the older queries are already stale
+            while not self.queries.empty() and request is not None:
+                request, query = self.queries.get()
+
+            if request is None:
+                break
+
+            try:
+                results = self.jmdict.search_gloss(query, self.limit)
+            except Exception:
+                traceback.print_exc()
+                results = []
+
+            self.found.emit(request, query, results)
+
+    def stop(self):
+        self.queries.put((None, None))
+        self.wait()
@@ -0,0 +1,191 @@
+import sqlite3
+from bisect import bisect_left
+
+
+# (inflected ending, dictionary ending), applied once to the end of a non-empty candidate span
+DEINFLECTIONS = (
+    # ichidan
+    ("た", "る"), ("て", "る"), ("ない", "る"), ("なかった", "る"), ("ます", "る"), ("ません", "る"),
+    ("ました", "る"), ("られる", "る"), ("させる", "る"), ("よう", "る"), ("れば", "る"), ("ろ", "る"), ("たい", "る"),
+    # godan
+    ("った", "う"), ("った", "つ"), ("った", "る"), ("って", "う"), ("って", "つ"), ("って", "る"),
+    ("んだ", "む"), ("んだ", "ぶ"), ("んだ", "ぬ"), ("んで", "む"), ("んで", "ぶ"), ("んで", "ぬ"),
+    ("いた", "く"), ("いて", "く"), ("いだ", "ぐ"), ("いで", "ぐ"), ("した", "す"), ("して", "す"),
+    ("います", "う"), ("きます", "く"), ("ぎます", "ぐ"), ("します", "す"), ("ちます", "つ"),
+    ("にます", "ぬ"), ("びます", "ぶ"), ("みます", "む"), ("ります", "る"),
+    ("わない", "う"), ("かない", "く"), ("がない", "ぐ"), ("さない", "す"), ("たない", "つ"),
+    ("なない", "ぬ"), ("ばない", "ぶ"), ("まない", "む"), ("らない", "る"),
+    ("えば", "う"), ("けば", "く"), ("げば", "ぐ"), ("せば", "す"), ("てば", "つ"), ("ねば", "ぬ"),
+    ("べば", "ぶ"), ("めば", "む"), ("れば", "る"),
+    ("いたい", "う"), ("きたい", "く"), ("ぎたい", "ぐ"), ("したい", "す"), ("ちたい", "つ"),
+    ("みたい", "む"), ("びたい", "ぶ"), ("りたい", "る"),
+    # i-adjectives
+    ("かった", "い"), ("くない", "い"), ("くなかった", "い"), ("くて", "い"), ("く", "い"), ("ければ", "い"),
+    ("さ", "い"), ("そう", "い")
+)
+
+# suru / kuru, these are whole words so they also apply without a stem (した -> する, 来た -> 来る)
+IRREGULAR_DEINFLECTIONS = (
+    ("した", "する"), ("して", "する"), ("します", "する"), ("しない", "する"), ("しました", "する"),
+    ("された", "する"), ("させる", "する"), ("きた", "くる"), ("きて", "くる"), ("こない", "くる"),
+    ("来た", "来る"), ("来て", "来る"), ("来ない", "来る")
+)
+
+
+class HeadwordTrie:
+    def __init__(self, headwords, presorted: bool = False):
+        """Longest-match headword scanner over a sorted key array
+
+        Every prefix step is a single bisect that tells both whether the prefix is a headword and whether any
+        headword continues it, like walking a (marisa-style) trie without building nodes.
+
+        Args:
+            headwords: Iterable of headword strings.
+            presorted (bool, optional): Whether `headwords` is already a sorted list without duplicates. Defaults to False.
+        """
+        self.keys: list[str] = headwords if presorted else sorted(set(headwords))
+        # first character of the ending -> (ending, replacement, whether it applies without a stem)
+        self.deinflections: dict[str, list[tuple[str, str, bool]]] = {}
+
+        for rules, whole_word in ((DEINFLECTIONS, False), (IRREGULAR_DEINFLECTIONS, True)):
+            for ending, replacement in rules:
+                self.deinflections.setdefault(ending[0], []).append((ending, replacement, whole_word))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, word: str) -> bool:
+        index = bisect_left(self.keys, word)
+
+        return index < len(self.keys) and self.keys[index] == word
+
+    @classmethod
+    def load(cls, path: str) -> "HeadwordTrie":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(f.read().split("\n"), presorted=True)
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(self.keys))
+
+    @classmethod
+    def from_databases(cls, *paths: str) -> "HeadwordTrie":
+        """Builds the trie from every kanji and kana headword of jmdict.db / jmnedict.db"""
+        headwords = set()
+
+        for path in paths:
+            connection = sqlite3.connect(path)
+
+            for table in ("kanji", "kana"):
+                headwords.update(
+                    row[0] for row in connection.execute(f"SELECT DISTINCT text FROM {table} WHERE text IS NOT NULL")
+                )
+
+            connection.close()
+
+        headwords.discard("")
+
+        return cls(headwords)
+
+    def _step(self, prefix: str) -> tuple[bool, bool]:
+        """Returns whether `prefix` is a headword and whether any headword starts with it"""
+        index = bisect_left(self.keys, prefix)
+
+        if index == len(self.keys):
+            return False, False
+
+        key = self.keys[index]
+
+        return key == prefix, key.startswith(prefix)
+
+    def longest_match(self, text: str, start: int = 0) -> tuple[int, str] | None:
+        """Finds the longest headword (or deinflected headword) starting at `start`
+
+        Args:
+            text (str): The text to scan.
+            start (int, optional): Where the match has to start. Defaults to 0.
+
+        Returns:
+            tuple[int, str] | None: The end of the matched span and the headword it matched, or None.
+        """
+        best = None
+        end = start
+
+        while True:
+            stem = text[start:end]
+
+            if end > start:
+                is_headword, is_prefix = self._step(stem)
+
+                if is_headword:
+                    best = (end, stem)
+
+                if not is_prefix:
+                    break
+
+            if end == len(text):
+                break
+
+            # the stem may be the start of a headword, try every inflected ending that follows it. without a stem only
+            # the irregular verbs, otherwise bare endings like て or さ would match any headword in る or い
+            for ending, replacement, whole_word in self.deinflections.get(text[end], ()):
+                if end == start and not whole_word:
+                    continue
+
+                if text.startswith(ending, end) and (best is None or end + len(ending) > best[0]):
+                    if stem + replacement in self:
+                        best = (end + len(ending), stem + replacement)
+
+            end += 1
+
+        return best
+
+    def segment(self, text: str) -> list[tuple[str, str | None]]:
+        """Greedily splits text into the longest headwords, without morphological analysis
+
+        Args:
+            text (str): The text to segment.
+
+        Returns:
+            list[tuple[str, str | None]]: (surface, headword) pairs, headword is None for unmatched runs.
+        """
+        output = []
+        unmatched = ""
+        position = 0
+
+        while position < len(text):
+            match = self.longest_match(text, position)
+
+            if match is None:
+                unmatched += text[position]
+                position += 1
+                continue
+
+            if unmatched:
+                output.append((unmatched, None))
+                unmatched = ""
+
+            end, headword = match
+            output.append((text[position:end], headword))
+            position = end
+
+        if unmatched:
+            output.append((unmatched, None))
+
+        return output
+
+
+def build_headword_trie(out_path: str, *db_paths: str) -> int:
+    """Prebuilds the headword trie used by `JMDict.lookup(mode="trie")`
+
+    Args:
+        out_path (str): Path of the headword file to write.
+        *db_paths (str): Dictionary databases to take headwords from.
+
+    Returns:
+        int: The number of headwords written.
+    """
+    trie = HeadwordTrie.from_databases(*db_paths)
+    trie.save(out_path)
+
+    return len(trie)
@@ -0,0 +1,301 @@
+import socket
+import socketserver
+import ujson
+from concurrent.futures import Future
+from queue import Queue, Empty
+from threading import Lock, Thread
+from utils.records import Token, Sense, Translation, LazyRecord
+
+
+DEFAULT_ADDRESS = ("127.0.0.1", 47815)
+
+# requests are one json object per line, anything longer than this is dropped
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+
+class LookupService(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, jmdict, address: tuple[str, int] = DEFAULT_ADDRESS, batch_size: int = 256):
+        """Serves one `JMDict` to every local process, so the sudachi dictionary, tags and connections are loaded once
+
+        Each client connection gets its own thread, but every dictionary call is run by a single worker thread,
+        so the connection pools only ever hold that thread's connections. Lookups that are waiting together (with
+        the same options) are looked up in one `lookup_many` call.
+
+        Args:
+            jmdict (JMDict): The dictionary to serve.
+            address (tuple[str, int], optional): Where to listen, keep it on localhost. Defaults to DEFAULT_ADDRESS.
+            batch_size (int, optional): Maximum texts per combined `lookup_many`. Defaults to 256.
+        """
+        self.jmdict = jmdict
+        self.batch_size = batch_size
+        # ("lookup_many", texts, options, future) or ("call", function, args, future)
+        self.jobs = Queue()
+        self.batcher = Thread(target=self._run_jobs, daemon=True)
+
+        super().__init__(address, LookupHandler)
+
+        self.batcher.start()
+
+    def lookup_many(self, texts: list[str], options: tuple) -> list[list[dict]]:
+        """Queues texts for the batcher and waits for their (json ready) results"""
+        future = Future()
+        self.jobs.put(("lookup_many", texts, options, future))
+
+        return future.result()
+
+    def call(self, function, *args):
+        """Runs `function(*args)` on the batcher thread and waits for its result"""
+        future = Future()
+        self.jobs.put(("call", function, args, future))
+
+        return future.result()
+
+    def _run_jobs(self):
+        while True:
+            jobs = [self.jobs.get()]
+
+            if jobs[0] is None:
+                break
+
+            # take everything else that queued up in the meantime
+            size = len(jobs[0][1]) if jobs[0][0] == "lookup_many" else 1
+
+            try:
+                while size < self.batch_size:
+                    job = self.jobs.get_nowait()
+
+                    if job is None:
+                        self.jobs.put(None)
+                        break
+
+                    jobs.append(job)
+                    size += len(job[1]) if job[0] == "lookup_many" else 1
+            except Empty:
+                pass
+
+            groups: dict[tuple, list] = {}
+
+            for kind, payload, options, future in jobs:
+                if kind == "lookup_many":
+                    groups.setdefault(options, []).append((payload, future))
+                    continue
+
+                try:
+                    future.set_result(payload(*options))
+                except Exception as e:
+                    future.set_exception(e)
+
+            for (common, mode, fuzzy), group in groups.items():
+                texts = [text for group_texts, _ in group for text in group_texts]
+
+                try:
+                    results = self.jmdict.lookup_many(texts, common=common, mode=mode, fuzzy=fuzzy)
+                except Exception as e:
+                    for _, future in group:
+                        future.set_exception(e)
+
+                    continue
+
+                i = 0
+
+                for group_texts, future in group:
+                    future.set_result([self.jmdict.to_plain(result) for result in results[i:i + len(group_texts)]])
+                    i += len(group_texts)
+
+    def hydrate(self, word_ids: dict[str, list[int]]) -> dict[str, dict[int, list[dict]]]:
+        return self.call(self._hydrate, word_ids)
+
+    def _hydrate(self, word_ids: dict[str, list[int]]) -> dict[str, dict[int, list[dict]]]:
+        return {
+            lazy_key: {
+                word_id: [item.to_dict() for item in items]
+                for word_id, items in self.jmdict.fetch_lazy(lazy_key, set(ids)).items()
+            }
+            for lazy_key, ids in word_ids.items() if lazy_key in ("senses", "translations")
+        }
+
+    def server_close(self):
+        self.jobs.put(None)
+        self.batcher.join()
+        super().server_close()
+
+
+class LookupHandler(socketserver.StreamRequestHandler):
+    server: LookupService
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_BYTES)
+
+            if not line:
+                break
+
+            if not line.endswith(b"\n"): # over MAX_REQUEST_BYTES, the rest of the stream can't be trusted
+                self.respond({"id": None, "error": "request too long"})
+                break
+
+            request = None
+
+            try:
+                request = ujson.loads(line)
+                response = {"id": request.get("id"), "result": self.call(request["method"], request.get("params", {}))}
+            except Exception as e:
+                response = {"id": request.get("id") if isinstance(request, dict) else None, "error": f"{type(e).__name__}: {e}"}
+
+            self.respond(response)
+
+    def respond(self, response: dict):
+        self.wfile.write(ujson.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def call(self, method: str, params: dict):
+        """Runs a request, anything touching the database goes through the service's worker thread"""
+        jmdict = self.server.jmdict
+
+        if method == "lookup_many":
+            options = (bool(params.get("common", True)), params.get("mode", "sudachi"), int(params.get("fuzzy", 0)))
+
+            return self.server.lookup_many(list(params["texts"]), options)
+        elif method == "hydrate":
+            return self.server.hydrate(params["word_ids"])
+        elif method == "search_gloss":
+            return self.server.call(jmdict.search_gloss, params["query"], params.get("limit", 20), params.get("lang", "eng"))
+        elif method == "fuzzy_lookup":
+            return self.server.call(jmdict.fuzzy_lookup, params["token"], params.get("max_distance", 1), params.get("limit", 10))
+        elif method == "stats":
+            return {"cache": jmdict.cache_stats(), "queries": jmdict.stats()}
+
+        raise ValueError(f"unknown method {method!r}")
+
+
+class LookupClient:
+    def __init__(self, address: tuple[str, int] = DEFAULT_ADDRESS, timeout: float | None = 30):
+        """Talks to a `LookupService`, with the same lookup methods as `JMDict`
+
+        Results are the same records `JMDict.lookup` returns, and senses / translations are still only loaded
+        when needed (one request per `hydrate_many`). Safe to share between threads.
+
+        Args:
+            address (tuple[str, int], optional): Where the service listens. Defaults to DEFAULT_ADDRESS.
+            timeout (float | None, optional): Seconds to wait for a response. Defaults to 30.
+        """
+        self.address = address
+        self.timeout = timeout
+        self._lock = Lock()
+        self._socket = None
+        self._file = None
+        self._id = 0
+
+    def _connect(self):
+        self._socket = socket.create_connection(self.address, self.timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._socket.makefile("rb")
+
+    def _call(self, method: str, **params):
+        with self._lock:
+            self._id += 1
+            request = ujson.dumps({"id": self._id, "method": method, "params": params}, ensure_ascii=False).encode("utf-8") + b"\n"
+
+            for attempt in range(2): # reconnect once if the service was restarted in between
+                try:
+                    if self._socket is None:
+                        self._connect()
+
+                    self._socket.sendall(request)
+                    line = self._file.readline()
+
+                    if not line:
+                        raise ConnectionError("lookup service closed the connection")
+
+                    break
+                except OSError:
+                    self.close()
+
+                    if attempt:
+                        raise
+
+        response = ujson.loads(line)
+
+        if "error" in response:
+            raise RuntimeError(f"lookup service: {response['error']}")
+
+        return response["result"]
+
+    def lookup(self, text: str, common=True, mode: str = "sudachi", fuzzy: int = 0) -> list[Token]:
+        """See `JMDict.lookup`"""
+        return self.lookup_many([text], common=common, mode=mode, fuzzy=fuzzy)[0]
+
+    def lookup_many(self, texts: list[str], common=True, mode: str = "sudachi", fuzzy: int = 0) -> list[list[Token]]:
+        """See `JMDict.lookup_many`, all texts are sent in one request"""
+        results = self._call("lookup_many", texts=texts, common=common, mode=mode, fuzzy=fuzzy)
+
+        return [[Token.from_dict(token, self.hydrate_many) for token in result] for result in results]
+
+    def hydrate_many(self, words: list):
+        """See `JMDict.hydrate_many`"""
+        pending = [word for word in words if isinstance(word, LazyRecord) and not word.hydrated]
+
+        if not pending:
+            return
+
+        word_ids: dict[str, list[int]] = {}
+
+        for word in pending:
+            word_ids.setdefault(word.lazy_key, []).append(word.id)
+
+        loaded = self._call("hydrate", word_ids=word_ids)
+
+        for word in pending:
+            record = Sense if word.lazy_key == "senses" else Translation
+            items = loaded[word.lazy_key].get(str(word.id), []) # json object keys are strings
+            setattr(word, word.lazy_key, [record.from_dict(item) for item in items])
+
+    def hydrate(self, word_id: int, name: bool = False) -> list:
+        """See `JMDict.hydrate`"""
+        lazy_key = "translations" if name else "senses"
+        record = Translation if name else Sense
+        items = self._call("hydrate", word_ids={lazy_key: [word_id]})[lazy_key].get(str(word_id), [])
+
+        return [record.from_dict(item) for item in items]
+
+    def search_gloss(self, query: str, limit: int = 20, lang: str = "eng") -> list[dict]:
+        """See `JMDict.search_gloss`"""
+        return self._call("search_gloss", query=query, limit=limit, lang=lang)
+
+    def fuzzy_lookup(self, token: str, max_distance: int = 1, limit: int = 10) -> list[tuple[str, int]]:
+        """See `JMDict.fuzzy_lookup`"""
+        return [tuple(candidate) for candidate in self._call("fuzzy_lookup", token=token, max_distance=max_distance, limit=limit)]
+
+    def stats(self) -> dict:
+        """Cache and query stats of the service's `JMDict`"""
+        return self._call("stats")
+
+    def close(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = self._file = None
+
+
+def open_dictionary(jmdict_path: str = "jmdict.db", jmnedict_path: str = "jmnedict.db", address: tuple[str, int] = DEFAULT_ADDRESS, **kwargs):
+    """Returns a client of the running lookup service, or loads a `JMDict` in this process if there's none
+
+    Args:
+        jmdict_path (str, optional): Used when there's no service. Defaults to "jmdict.db".
+        jmnedict_path (str, optional): Used when there's no service. Defaults to "jmnedict.db".
+        address (tuple[str, int], optional): Where the service would listen. Defaults to DEFAULT_ADDRESS.
+        **kwargs: Passed on to `JMDict`.
+
+    Returns:
+        LookupClient | JMDict: Either one, they share the lookup methods.
+    """
+    try:
+        socket.create_connection(address, 0.5).close()
+    except OSError:
+        from utils.dictionary import JMDict # only load sudachi when it's actually needed
+
+        return JMDict(jmdict_path, jmnedict_path, **kwargs)
+
+    return LookupClient(address)
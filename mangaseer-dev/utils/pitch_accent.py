@@ -1,56 +1,258 @@
+import os
+import sqlite3
 import ujson
+from threading import Lock
+from utils.cache import LRUCache, MISSING
+from utils.connection_pool import ConnectionPool
 
 
-with open("readings.json", "r", encoding="utf-8") as f:
-    readings: dict[str, list[list[str, str]]] = ujson.load(f)
+ACCENTS_DB_PATH = "readings.db"
+ACCENTS_JSON_PATH = "readings.json" # what accent_to_json.py used to write, still read if there's no database
 
+# bumped whenever the accents table changes shape
+ACCENTS_FORMAT = 2
 
-def get_pitch(word: str) -> tuple[tuple[tuple[str, tuple[str]]]] | None:
-    word_readings = readings.get(word)
+# small kana are pronounced together with the kana before them (っ / ッ and ー are morae of their own)
+SMALL_KANA = frozenset("ぁぃぅぇぉゃゅょゎゕゖァィゥェォャュョヮヵヶㇰㇱㇲㇳㇴㇵㇶㇷㇸㇹㇺㇻㇼㇽㇾㇿ")
 
-    if not word_readings:
-        return
+MORA_SEPARATOR = "|"
 
-    output = []
+HIGH = "high"
+LOW = "low"
 
-    for reading, pitch_accents in word_readings:
-        output.append([])
-        morae = []
 
-        for char in reading:
-            if char in "ゃゅょ":
-                morae[-1] += char
-            else:
-                morae.append(char)
+def read_accents(path: str):
+    """Yields (word, reading, comma separated accents) from a tab separated accents.txt"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                word, reading, pitch = line.strip().split("\t")
+                yield word, reading, pitch
 
-        for pitch_accent in pitch_accents.split(","):
-            output[-1].append([])
-            pitch_accent = int("".join(c for c in pitch_accent if c.isdigit()))
 
-            for i, mora in enumerate(morae):
-                if pitch_accent == 0:
-                    if i == 0:
-                        position = "low"
-                    else:
-                        position = "high"
-                elif pitch_accent == 1:
-                    if i == 0:
-                        position = "high"
-                    else:
-                        position = "low"
-                else:
-                    if i != 0 and i < pitch_accent + 1:
-                        position = "high"
-                    else:
-                        position = "low"
+def generate_accents_json(path: str, json_path: str = ACCENTS_JSON_PATH) -> int:
+    """Writes accents.txt as {word: [[reading, accents], ...]}, which has to be loaded whole
 
-                output[-1][-1].append((mora, position))
-            
-            output[-1][-1] = tuple(output[-1][-1])
+    Returns:
+        int: The number of readings written.
+    """
+    json_obj = {}
+    rows = 0
 
-        output[-1] = tuple(set(output[-1])) # deduplication
+    for word, reading, pitch in read_accents(path):
+        json_obj.setdefault(word, []).append([reading, pitch])
+        rows += 1
 
-    return tuple(output)
+    with open(json_path, "w", encoding="utf-8") as f:
+        ujson.dump(json_obj, f)
+
+    return rows
+
+
+def generate_accents_sqlite(path: str, db_path: str = ACCENTS_DB_PATH) -> int:
+    """Writes accents.txt into an sqlite table indexed by word, so `get_pitch` can read single words on demand
+
+    Morae and high / low patterns are worked out here, `get_pitch` only has to decode them.
+
+    Args:
+        path (str): Path to accents.txt (word, reading and comma separated accents, tab separated).
+        db_path (str, optional): Path of the database to build, replaced if it exists. Defaults to ACCENTS_DB_PATH.
+
+    Returns:
+        int: The number of patterns written, one per distinct (word, reading, high / low pattern).
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    connection = sqlite3.connect(db_path)
+    connection.execute("""CREATE TABLE "accents" (
+	"id" INTEGER NOT NULL UNIQUE,
+	"word" TEXT NOT NULL,
+	"reading" TEXT NOT NULL,
+	"line" INTEGER NOT NULL,
+	"morae" TEXT NOT NULL,
+	"pattern" INTEGER NOT NULL,
+	PRIMARY KEY("id")
+);""")
+
+    with connection:
+        rows = connection.executemany(
+            "INSERT INTO accents (word, reading, line, morae, pattern) VALUES (?, ?, ?, ?, ?)",
+            accent_rows(read_accents(path))
+        ).rowcount
+
+        connection.execute("CREATE INDEX accents_word ON accents (word)")
+        connection.execute(f"PRAGMA user_version = {ACCENTS_FORMAT}")
+
+    connection.close()
+
+    return rows
+
+
+def split_morae(reading: str) -> list[str]:
+    """Splits a reading into morae, e.g. "しゅっちょう" into しゅ, っ, ちょ, う"""
+    morae = []
+
+    for char in reading:
+        if char in SMALL_KANA and morae:
+            morae[-1] += char
+        else:
+            morae.append(char)
+
+    return morae
+
+
+def parse_accents(pitch: str) -> list[int]:
+    """Accent numbers out of an accents.txt column like "0,2" (anything that isn't a digit is ignored)"""
+    return [int("".join(c for c in pitch_accent if c.isdigit())) for pitch_accent in pitch.split(",")]
+
+
+def pitch_mask(mora_count: int, pitch_accent: int) -> int:
+    """Which morae are pronounced high for an accent, bit i set for a high i-th mora"""
+    mask = 0
+
+    for i in range(mora_count):
+        if pitch_accent == 0:
+            high = i != 0
+        elif pitch_accent == 1:
+            high = i == 0
+        else:
+            high = i != 0 and i < pitch_accent + 1
+
+        mask |= high << i
+
+    return mask
+
+
+def pitch_masks(mora_count: int, pitch: str) -> list[int]:
+    """Distinct masks of every accent in a column, in order (e.g. heiban and odaka look the same in isolation)"""
+    return list(dict.fromkeys(pitch_mask(mora_count, pitch_accent) for pitch_accent in parse_accents(pitch)))
+
+
+def accent_rows(accents):
+    """(word, reading, accents) -> (word, reading, line, morae, mask) rows for the accents table
+
+    `line` numbers the input rows, the same reading can be listed more than once and each one stays separate.
+    """
+    for line, (word, reading, pitch) in enumerate(accents):
+        morae = split_morae(reading)
+
+        for mask in pitch_masks(len(morae), pitch):
+            yield word, reading, line, MORA_SEPARATOR.join(morae), mask
+
+
+# (mora count, mask) -> "high" / "low" per mora, there are only a few hundred of them
+_levels: dict[tuple[int, int], tuple[str, ...]] = {}
+
+
+def decode_pattern(morae: list[str], mask: int) -> tuple[tuple[str, str], ...]:
+    """(mora, "high" / "low") pairs of a stored pattern"""
+    key = (len(morae), mask)
+    levels = _levels.get(key)
+
+    if levels is None:
+        levels = _levels[key] = tuple(HIGH if mask >> i & 1 else LOW for i in range(len(morae)))
+
+    return tuple(zip(morae, levels))
+
+
+class PitchAccents:
+    def __init__(self, path: str = ACCENTS_DB_PATH, cache_size: int = 4096):
+        """Pitch accents read from the database one word at a time, with the most recent words kept
+
+        Args:
+            path (str, optional): Database made by `generate_accents_sqlite`, or a readings.json from older
+                builds (loaded whole on first use). Defaults to ACCENTS_DB_PATH.
+            cache_size (int, optional): Maximum number of words kept. Defaults to 4096.
+        """
+        self.path = path
+        self.cache = LRUCache(cache_size)
+
+        self._pool = None
+        self._readings = None
+        self._lock = Lock()
+
+    def _word_patterns(self, word: str) -> list[tuple[int, str, int]]:
+        """(line, morae, mask) rows of a word, in accents.txt order"""
+        if self.path.endswith(".json"):
+            with self._lock:
+                if self._readings is None:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._readings = ujson.load(f)
+
+            # the old format only has the raw accents, so they're worked out on every call
+            rows = accent_rows((word, reading, pitch) for reading, pitch in self._readings.get(word, []))
+
+            return [(line, morae, mask) for _, _, line, morae, mask in rows]
+
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    pool = ConnectionPool(self.path)
+                    version = pool.connection().execute("PRAGMA user_version").fetchone()[0]
+
+                    if version != ACCENTS_FORMAT:
+                        pool.close()
+                        raise ValueError(f"{self.path} has accent format {version}, rebuild it with accent_to_json.py")
+
+                    self._pool = pool
+
+        return self._pool.cursor().execute(
+            "SELECT line, morae, pattern FROM accents WHERE word = ? ORDER BY id", (word,)
+        ).fetchall()
+
+    def get_pitch(self, word: str) -> tuple[tuple[tuple[tuple[str, str], ...], ...], ...] | None:
+        """Pitch accent patterns of every reading of a word
+
+        Args:
+            word (str): The word as written, e.g. "化物".
+
+        Returns:
+            tuple | None: Per reading, its distinct patterns as (mora, "high" / "low") pairs, in accents.txt order.
+                None if the word has no accent data.
+        """
+        output = self.cache.get(word)
+
+        if output is not MISSING:
+            return output
+
+        readings = []
+        last_line = None
+
+        for line, morae, mask in self._word_patterns(word): # rows of one reading are next to each other
+            if line != last_line:
+                readings.append([])
+                last_line = line
+
+            readings[-1].append(decode_pattern(morae.split(MORA_SEPARATOR), mask))
+
+        output = tuple(map(tuple, readings)) or None
+        self.cache.put(word, output)
+
+        return output
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+
+
+_accents: PitchAccents | None = None
+_accents_lock = Lock()
+
+
+def get_accents() -> PitchAccents:
+    """The shared accent store, readings.db if it was built, otherwise readings.json"""
+    global _accents
+
+    with _accents_lock:
+        if _accents is None:
+            _accents = PitchAccents(ACCENTS_DB_PATH if os.path.exists(ACCENTS_DB_PATH) else ACCENTS_JSON_PATH)
+
+    return _accents
+
+
+def get_pitch(word: str) -> tuple[tuple[tuple[tuple[str, str], ...], ...], ...] | None:
+    return get_accents().get_pitch(word)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+import traceback
+from queue import Queue
+from PySide6 import QtCore
+
+
+class LookupPrefetcher(QtCore.QThread):
+    # page, index of the text on the page, the text and its lookup result
+    prefetched = QtCore.Signal(int, int, str, object)
+    # page and why its lookups failed, the worker carries on with the next page
+    failed = QtCore.Signal(int, str)
+
+    def __init__(self, jmdict, **lookup_options):
+        """Looks up every bubble of a page in the background, right after ocr
+
+        Args:
+            jmdict (JMDict): The dictionary to look words up with.
+            **lookup_options: Passed on to `JMDict.lookup_many`, e.g. common=True.
+        """
+        super().__init__()
+
+        self.jmdict = jmdict
+        self.lookup_options = lookup_options
+        self.pages = Queue()
+
+    def prefetch(self, page: int, texts: list[str]):
+        self.pages.put((page, texts))
+
+    def run(self):
+        while True:
+            page, texts = self.pages.get()
+
+            # only the newest page is still on screen if scans came in faster than lookups
+            while not self.pages.empty() and page is not None:
+                page, texts = self.pages.get()
+
+            if page is None:
+                break
+
+            try:
+                results = self.jmdict.lookup_many(texts, **self.lookup_options)
+
+                # one batch for the whole page, so clicking a word doesn't have to query its senses
+                self.jmdict.hydrate_many([word for tokens in results for token in tokens if token["type"] for word in token["words"]])
+            except Exception as e: # e.g. the database being swapped mid-lookup, the popups look the text up themselves then
+                traceback.print_exc()
+                self.failed.emit(page, f"{type(e).__name__}: {e}")
+                continue
+
+            for i, (text, tokens) in enumerate(zip(texts, results)):
+                self.prefetched.emit(page, i, text, tokens)
+
+    def stop(self):
+        self.pages.put((None, None))
+        self.wait()
@@ -0,0 +1,201 @@
+import re
+import sqlite3
+import ujson
+from contextlib import contextmanager
+from threading import Lock, local
+from time import perf_counter
+
+
+# sqlite virtual machine instructions between progress handler calls
+PROGRESS_STEPS = 1000
+
+_PLACEHOLDERS = re.compile(r"\bIN \(\?(?:\s*,\s*\?)*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapses whitespace and `IN (?, ?, ...)` lists so every chunk size of a query is counted as one statement"""
+    return _PLACEHOLDERS.sub("IN (?, ...)", _WHITESPACE.sub(" ", sql).strip())
+
+
+class QueryStats:
+    def __init__(self):
+        """Aggregates sqlite statements (calls, time, rows, vm steps) and the queries issued per lookup
+
+        Connections are hooked up with `install`, which `ConnectionPool` does for every thread's connection.
+        """
+        self._lock = Lock()
+        self._local = local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.statements: dict[str, dict] = {}
+            self.calls: dict[str, dict] = {}
+
+    def install(self, connection: sqlite3.Connection, database: str) -> sqlite3.Cursor:
+        """Adds the progress handler to a connection
+
+        Args:
+            connection (sqlite3.Connection): The connection to instrument.
+            database (str): Name its statements are reported under, e.g. "jmdict.db".
+
+        Returns:
+            sqlite3.Cursor: A cursor of the connection that records what it runs, only queries made through it
+                are timed.
+        """
+        connection.set_progress_handler(self._progress, PROGRESS_STEPS)
+        cursor = connection.cursor(TracedCursor)
+        cursor.stats = self
+        cursor.database = database
+
+        return cursor
+
+    def _progress(self, *_) -> int:
+        statement = getattr(self._local, "statement", None)
+
+        if statement is not None:
+            with self._lock:
+                statement["steps"] += PROGRESS_STEPS
+
+        return 0 # anything else aborts the query
+
+    def _statement(self, database: str, sql: str) -> dict:
+        key = f"{database}: {normalize_sql(sql)}"
+
+        with self._lock:
+            statement = self.statements.get(key)
+
+            if statement is None:
+                statement = self.statements[key] = {"calls": 0, "rows": 0, "time": 0.0, "max_time": 0.0, "steps": 0}
+
+        return statement
+
+    def record(self, statement: dict, elapsed: float, call_time: float, rows: int = 0, new_call: bool = False):
+        """Adds `elapsed` seconds (and `rows`) to a statement, `call_time` is everything spent on this call so far"""
+        with self._lock:
+            statement["time"] += elapsed
+            statement["rows"] += rows
+            statement["calls"] += new_call
+            statement["max_time"] = max(statement["max_time"], call_time)
+
+        if new_call:
+            self._local.queries = getattr(self._local, "queries", 0) + 1
+
+    @contextmanager
+    def measure(self, name: str, items: int = 1):
+        """Counts the queries this thread issues inside the block as one call of `name`, e.g. one `lookup_many`
+
+        Args:
+            name (str): What is being measured.
+            items (int, optional): How many things the call handled, e.g. texts. Defaults to 1.
+        """
+        before = getattr(self._local, "queries", 0)
+        start = perf_counter()
+
+        try:
+            yield
+        finally:
+            queries = getattr(self._local, "queries", 0) - before
+            elapsed = perf_counter() - start
+
+            with self._lock:
+                call = self.calls.setdefault(name, {"calls": 0, "items": 0, "queries": 0, "max_queries": 0, "time": 0.0})
+                call["calls"] += 1
+                call["items"] += items
+                call["queries"] += queries
+                call["max_queries"] = max(call["max_queries"], queries)
+                call["time"] += elapsed
+
+    def stats(self) -> dict:
+        """Snapshot of everything recorded so far
+
+        Returns:
+            dict: "statements" ("database: normalized sql" -> calls, rows, total / mean / max ms and vm steps, slowest first),
+                "calls" (e.g. "lookup_many" -> calls, items, queries, queries per call / item, max queries, ms) and
+                the overall number of queries, rows and ms.
+        """
+        with self._lock:
+            statements = {
+                sql: {
+                    "calls": statement["calls"],
+                    "rows": statement["rows"],
+                    "total_ms": statement["time"] * 1000,
+                    "mean_ms": statement["time"] * 1000 / statement["calls"] if statement["calls"] else 0.0,
+                    "max_ms": statement["max_time"] * 1000,
+                    "steps": statement["steps"]
+                }
+                for sql, statement in sorted(self.statements.items(), key=lambda item: -item[1]["time"])
+            }
+            calls = {
+                name: {
+                    "calls": call["calls"],
+                    "items": call["items"],
+                    "queries": call["queries"],
+                    "queries_per_call": call["queries"] / call["calls"],
+                    "queries_per_item": call["queries"] / call["items"] if call["items"] else 0.0,
+                    "max_queries": call["max_queries"],
+                    "total_ms": call["time"] * 1000
+                }
+                for name, call in self.calls.items()
+            }
+
+        return {
+            "queries": sum(statement["calls"] for statement in statements.values()),
+            "rows": sum(statement["rows"] for statement in statements.values()),
+            "total_ms": sum(statement["total_ms"] for statement in statements.values()),
+            "calls": calls,
+            "statements": statements
+        }
+
+    def dump(self, path: str):
+        """Writes `stats` to a json file"""
+        with open(path, "w", encoding="utf-8") as f:
+            ujson.dump(self.stats(), f, ensure_ascii=False, indent=2)
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement's time and rows to its `stats`"""
+    stats: QueryStats
+    database: str
+
+    def execute(self, sql: str, parameters=()):
+        statement = self._current = self.stats._statement(self.database, sql)
+        self.stats._local.statement = statement
+        start = perf_counter()
+
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._call_time = perf_counter() - start
+            self.stats.record(statement, self._call_time, self._call_time, new_call=True)
+            self.stats._local.statement = None
+
+    def _fetch(self, fetch, *args):
+        statement = getattr(self, "_current", None)
+
+        if statement is None:
+            return fetch(*args)
+
+        self.stats._local.statement = statement
+        start = perf_counter()
+
+        try:
+            rows = fetch(*args)
+        finally:
+            self.stats._local.statement = None
+
+        elapsed = perf_counter() - start
+        self._call_time += elapsed
+        self.stats.record(statement, elapsed, self._call_time, len(rows) if isinstance(rows, list) else rows is not None)
+
+        return rows
+
+    def fetchall(self) -> list:
+        return self._fetch(super().fetchall)
+
+    def fetchmany(self, size: int = 1) -> list:
+        return self._fetch(super().fetchmany, size)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
@@ -0,0 +1,263 @@
+import sys
+
+
+EMPTY = ()
+
+# raw tag column value -> interned tuple, the same few hundred combinations repeat across the whole dictionary
+_tags: dict[str, tuple[str, ...]] = {}
+_tag_lists: dict[tuple[str, ...], tuple[str, ...]] = {}
+
+
+def intern_tags(tags: str | None) -> tuple[str, ...]:
+    """Splits a comma separated tag column into a shared tuple of interned strings"""
+    if not tags:
+        return EMPTY
+
+    cached = _tags.get(tags)
+
+    if cached is None:
+        cached = _tags[tags] = tuple(sys.intern(tag) for tag in tags.split(","))
+
+    return cached
+
+
+def intern_tag_list(tags: list[str]) -> tuple[str, ...]:
+    """Same as `intern_tags` for tags that are already split, like the lists in entry blobs"""
+    if not tags:
+        return EMPTY
+
+    key = tuple(tags)
+    cached = _tag_lists.get(key)
+
+    if cached is None:
+        cached = _tag_lists[key] = tuple(sys.intern(tag) for tag in tags)
+
+    return cached
+
+
+class Record:
+    """Base of the lookup result types
+
+    Fields are slots, but they can still be read like the dicts they replaced (`word["senses"]`, `token.get("fuzzy")`,
+    `"reading" in word`). Fields that aren't set, like the reading of a kana-only word, count as missing keys.
+    """
+    __slots__ = ()
+    fields: tuple[str, ...] = ()
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value):
+        setattr(self, key, value)
+
+    def _is_set(self, key: str) -> bool:
+        try:
+            object.__getattribute__(self, key)
+        except AttributeError:
+            return False
+
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.fields and self._is_set(key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in self.fields else default
+
+    def keys(self) -> list[str]:
+        return [key for key in self.fields if self._is_set(key)]
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{key}={getattr(self, key)!r}' for key in self.keys())})"
+
+    def to_dict(self, exclude: tuple[str, ...] = EMPTY) -> dict:
+        """Plain dict (recursively) for json, leaving out unset fields and the ones in `exclude`"""
+        return {key: _to_plain(getattr(self, key)) for key in self.keys() if key not in exclude}
+
+
+def _to_plain(value):
+    if isinstance(value, Record):
+        return value.to_dict()
+
+    if isinstance(value, (tuple, list)):
+        return [_to_plain(item) for item in value]
+
+    return value
+
+
+class Gloss(Record):
+    __slots__ = fields = ("gender", "text", "lang")
+
+    def __init__(self, gender: str | None, text: str, lang: str):
+        self.gender = gender
+        self.text = text
+        self.lang = sys.intern(lang)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Gloss":
+        return cls(data["gender"], data["text"], data["lang"])
+
+
+class Sense(Record):
+    __slots__ = fields = ("id", "dialect", "misc", "info", "pos", "field", "gloss")
+
+    def __init__(
+            self,
+            id: int,
+            dialect: tuple[str, ...],
+            misc: tuple[str, ...],
+            info: str | None,
+            pos: tuple[str, ...],
+            field: tuple[str, ...],
+            gloss: list[Gloss]
+        ):
+        self.id = id
+        self.dialect = dialect
+        self.misc = misc
+        self.info = info
+        self.pos = pos
+        self.field = field
+        self.gloss = gloss
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Sense":
+        return cls(
+            data["id"],
+            intern_tag_list(data["dialect"]),
+            intern_tag_list(data["misc"]),
+            data["info"],
+            intern_tag_list(data["pos"]),
+            intern_tag_list(data["field"]),
+            [Gloss(gloss["gender"], gloss["text"], gloss["lang"]) for gloss in data["gloss"]]
+        )
+
+
+class Translation(Record):
+    __slots__ = fields = ("text", "type")
+
+    def __init__(self, text: str | None, type: tuple[str, ...]):
+        self.text = text
+        self.type = type
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Translation":
+        return cls(data["text"], intern_tag_list(data["type"]))
+
+
+class LazyRecord(Record):
+    """Record whose `lazy_key` field is only loaded (through `loader`) when first read
+
+    Use `JMDict.hydrate_many` to load several at once.
+    """
+    __slots__ = ("loader",)
+    lazy_key = ""
+
+    def __getattr__(self, name: str):
+        # only reached for unset slots
+        if name == self.lazy_key and self.loader is not None:
+            self.loader([self])
+
+            return object.__getattribute__(self, name)
+
+        raise AttributeError(name)
+
+    @property
+    def hydrated(self) -> bool:
+        return Record._is_set(self, self.lazy_key)
+
+    def copy(self) -> "LazyRecord":
+        """Shallow copy, so hydrating a lookup result doesn't grow the cached record it came from"""
+        record = object.__new__(type(self))
+
+        for key in self.fields + ("loader",):
+            if Record._is_set(self, key):
+                object.__setattr__(record, key, object.__getattribute__(self, key))
+
+        return record
+
+    def _is_set(self, key: str) -> bool:
+        # the lazy field counts as set as long as it can be loaded
+        return super()._is_set(key) or key == self.lazy_key and self.loader is not None
+
+
+class Word(LazyRecord):
+    __slots__ = ("id", "tags", "common", "reading", "pitch", "senses")
+    fields = __slots__
+    lazy_key = "senses"
+
+    def __init__(self, id: int, tags: tuple[str, ...], common: bool, loader=None):
+        self.id = id
+        self.tags = tags
+        self.common = common
+        self.loader = loader
+
+    @classmethod
+    def from_dict(cls, data: dict, loader=None) -> "Word":
+        word = cls(data["id"], intern_tag_list(data["tags"]), data["common"], loader)
+
+        if "reading" in data:
+            word.reading = data["reading"]
+
+        if "pitch" in data: # json turns the (mora, "high" / "low") pairs into lists
+            word.pitch = tuple(tuple(tuple(mora) for mora in pattern) for pattern in data["pitch"])
+
+        if "senses" in data:
+            word.senses = [Sense.from_dict(sense) for sense in data["senses"]]
+
+        return word
+
+
+class Name(LazyRecord):
+    __slots__ = ("id", "tags", "reading", "translations")
+    fields = __slots__
+    lazy_key = "translations"
+
+    def __init__(self, id: int, tags: tuple[str, ...], loader=None):
+        self.id = id
+        self.tags = tags
+        self.loader = loader
+
+    @classmethod
+    def from_dict(cls, data: dict, loader=None) -> "Name":
+        name = cls(data["id"], intern_tag_list(data["tags"]), loader)
+
+        if "reading" in data:
+            name.reading = data["reading"]
+
+        if "translations" in data:
+            name.translations = [Translation.from_dict(translation) for translation in data["translations"]]
+
+        return name
+
+
+class Token(Record):
+    __slots__ = fields = ("text", "pos", "type", "words", "fuzzy")
+
+    def __init__(
+            self,
+            text: str,
+            pos: tuple[tuple[str, str], ...],
+            type: str | None = None,
+            words: tuple[Word | Name, ...] = EMPTY,
+            fuzzy: str | None = None
+        ):
+        self.text = text
+        self.pos = pos
+        self.type = type
+        self.words = words
+        self.fuzzy = fuzzy
+
+    @classmethod
+    def from_dict(cls, data: dict, loader=None) -> "Token":
+        record = Name if data["type"] == "name" else Word
+
+        return cls(
+            data["text"],
+            tuple(intern_tag_list(tag) for tag in data["pos"]),
+            data["type"],
+            tuple(record.from_dict(word, loader) for word in data.get("words", EMPTY)),
+            data.get("fuzzy")
+        )
@@ -0,0 +1,176 @@
+import os
+import sys
+import struct
+import marshal
+import ujson
+from hashlib import blake2b
+from threading import Lock
+
+
+# the project directory, so resources are found whatever the working directory is
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESOURCE_PACK_PATH = os.path.join(ROOT, "resources.pack")
+
+# resource name -> source file, relative to ROOT
+SOURCES = {
+    "jmdict_tags": "jmdict_tags.json",
+    "jmnedict_tags": "jmnedict_tags.json",
+    "pos_tags": "pos_tags.json",
+    "kanji": "kanji.txt"
+}
+
+MAGIC = b"MSRP"
+VERSION = 1
+
+# magic, format version, marshal version, payload size, payload checksum
+HEADER = struct.Struct("<4sIIQ16s")
+
+
+def _checksum(payload: bytes) -> bytes:
+    return blake2b(payload, digest_size=16).digest()
+
+
+def read_sources(root: str = ROOT) -> dict:
+    """Reads the resource files into frozen, interned tables
+
+    Returns:
+        dict: jmdict_tags / jmnedict_tags (tag -> description), pos_tags (sudachi part of speech -> (jmdict tag,
+            description)) and kanji (frozenset of characters).
+    """
+    paths = {name: os.path.join(root, path) for name, path in SOURCES.items()}
+    resources = {}
+
+    for name in ("jmdict_tags", "jmnedict_tags"):
+        with open(paths[name], "r", encoding="utf-8") as f:
+            resources[name] = {sys.intern(tag): sys.intern(text) for tag, text in ujson.load(f).items()}
+
+    with open(paths["pos_tags"], "r", encoding="utf-8") as f:
+        resources["pos_tags"] = {
+            sys.intern(pos): tuple(sys.intern(text) for text in tag)
+            for pos, tag in ujson.load(f).items()
+        }
+
+    with open(paths["kanji"], "r", encoding="utf-8") as f:
+        resources["kanji"] = frozenset(line.strip() for line in f if line.strip())
+
+    return resources
+
+
+def compile_resources(pack_path: str = RESOURCE_PACK_PATH, root: str = ROOT) -> dict[str, int]:
+    """Bundles the tag tables, part of speech map and kanji list into one file for `get_resources`
+
+    Layout: header, then the marshalled tables. Interned strings stay interned when they're loaded, and marshal's
+    format depends on the python version, so the pack is rebuilt (or the sources read) when that changes. The kanji
+    are stored as one string, building the set from it is about twice as fast as unmarshalling a frozenset.
+
+    Args:
+        pack_path (str, optional): Path of the pack to write. Defaults to RESOURCE_PACK_PATH.
+        root (str, optional): Directory the sources are in. Defaults to ROOT.
+
+    Returns:
+        dict[str, int]: Number of entries per table.
+    """
+    resources = read_sources(root)
+    kanji = resources["kanji"]
+    single = "".join(sorted(k for k in kanji if len(k) == 1))
+
+    payload = marshal.dumps({
+        **resources,
+        "kanji": (single, tuple(sorted(k for k in kanji if len(k) != 1)))
+    })
+
+    with open(pack_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, marshal.version, len(payload), _checksum(payload)))
+        f.write(payload)
+
+    return {name: len(table) for name, table in resources.items()}
+
+
+def load_resource_pack(pack_path: str = RESOURCE_PACK_PATH) -> dict:
+    """Reads a pack written by `compile_resources`
+
+    Raises:
+        ValueError: If the file isn't a pack of this version, or it's truncated or corrupted.
+    """
+    with open(pack_path, "rb") as f:
+        data = f.read()
+
+    if len(data) < HEADER.size:
+        raise ValueError(f"{pack_path} is not a resource pack")
+
+    magic, version, marshal_version, size, checksum = HEADER.unpack_from(data, 0)
+
+    if magic != MAGIC or version != VERSION or marshal_version != marshal.version:
+        raise ValueError(f"{pack_path} is not a resource pack (version {VERSION}) for this python, recompile it")
+
+    payload = data[HEADER.size:]
+
+    if len(payload) != size or _checksum(payload) != checksum:
+        raise ValueError(f"{pack_path} is corrupted, recompile it")
+
+    resources = marshal.loads(payload)
+    single, other = resources["kanji"]
+    resources["kanji"] = frozenset(single).union(other)
+
+    return resources
+
+
+def _pack_is_current(pack_path: str, root: str) -> bool:
+    """Whether the pack exists and no source file was changed after it was compiled"""
+    try:
+        compiled = os.stat(pack_path).st_mtime_ns
+    except OSError:
+        return False
+
+    for path in SOURCES.values():
+        try:
+            if os.stat(os.path.join(root, path)).st_mtime_ns > compiled:
+                return False
+        except OSError: # sources don't have to ship with the pack
+            pass
+
+    return True
+
+
+class Resources:
+    __slots__ = ("jmdict_tags", "jmnedict_tags", "pos_tags", "kanji", "source")
+
+    def __init__(self, tables: dict, source: str):
+        """Lookup tables shared by the dictionary and the dataset tools
+
+        Args:
+            tables (dict): See `read_sources`.
+            source (str): Where they were loaded from, the pack's path or "sources".
+        """
+        self.jmdict_tags: dict[str, str] = tables["jmdict_tags"]
+        self.jmnedict_tags: dict[str, str] = tables["jmnedict_tags"]
+        self.pos_tags: dict[str, tuple[str, str]] = tables["pos_tags"]
+        self.kanji: frozenset[str] = tables["kanji"]
+        self.source = source
+
+
+_resources: Resources | None = None
+_resources_lock = Lock()
+
+
+def get_resources() -> Resources:
+    """The process-wide tables, from resources.pack if it's up to date, otherwise read from the source files"""
+    global _resources
+
+    with _resources_lock:
+        if _resources is None:
+            if _pack_is_current(RESOURCE_PACK_PATH, ROOT):
+                _resources = Resources(load_resource_pack(RESOURCE_PACK_PATH), RESOURCE_PACK_PATH)
+            else:
+                try:
+                    tables = read_sources(ROOT)
+                except FileNotFoundError as e:
+                    raise FileNotFoundError(
+                        f"{RESOURCE_PACK_PATH} is missing or out of date and {e.filename} can't be read, restore it "
+                        "and build the pack with `python compile_resources.py`"
+                    ) from e
+
+                _resources = Resources(tables, "sources")
+
+    return _resources
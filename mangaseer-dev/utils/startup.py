@@ -0,0 +1,189 @@
+import os
+import sys
+from contextlib import contextmanager, nullcontext
+from threading import Lock, current_thread
+from time import perf_counter
+from PySide6 import QtCore
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def rss_bytes() -> int | None:
+    """Current resident memory of the process, None where it can't be read"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class StartupProfile:
+    def __init__(self, enabled: bool = True, start: float | None = None):
+        """Records how long each part of startup takes and how much memory it adds
+
+        Memory is the resident size of the whole process, so components loading at the same time in different
+        threads share their increase.
+
+        Args:
+            enabled (bool, optional): Whether to record anything, `measure` does nothing otherwise. Defaults to True.
+            start (float | None, optional): `perf_counter()` at which startup began. Defaults to None (now).
+        """
+        self.enabled = enabled
+        self.start = perf_counter() if start is None else start
+        self.records: list[dict] = []
+        self._lock = Lock()
+
+    def _record(self, name: str, start: float, seconds: float, rss_before: int | None, rss_after: int | None):
+        with self._lock:
+            self.records.append({
+                "name": name,
+                "thread": current_thread().name,
+                "start": start - self.start,
+                "seconds": seconds,
+                "rss": rss_after,
+                "rss_added": rss_after - rss_before if rss_before is not None and rss_after is not None else None
+            })
+
+    def measure(self, name: str):
+        """Context manager timing the block as `name`"""
+        return self._measure(name) if self.enabled else nullcontext()
+
+    @contextmanager
+    def _measure(self, name: str):
+        rss_before = rss_bytes()
+        start = perf_counter()
+
+        try:
+            yield
+        finally:
+            self._record(name, start, perf_counter() - start, rss_before, rss_bytes())
+
+    def mark(self, name: str):
+        """Records how long it took from the profile's creation until now to get to `name`"""
+        if self.enabled:
+            self._record(name, self.start, perf_counter() - self.start, None, rss_bytes())
+
+    def report(self, file=sys.stdout):
+        mib = lambda size: f"{size / 1024 / 1024:8.1f}" if size is not None else f"{'-':>8}"
+
+        with self._lock:
+            records = sorted(self.records, key=lambda record: record["start"] + record["seconds"]) # in order of finishing
+
+        print(f"{'':<32} {'thread':<16} {'start s':>8} {'took s':>8} {'rss MiB':>8} {'+MiB':>8}", file=file)
+
+        for record in records:
+            print(
+                f"{record['name']:<32} {record['thread'][:16]:<16} {record['start']:8.3f} {record['seconds']:8.3f} "
+                f"{mib(record['rss'])} {mib(record['rss_added'])}",
+                file=file
+            )
+
+
+class ComponentLoader(QtCore.QThread):
+    loaded = QtCore.Signal(str, object)
+    failed = QtCore.Signal(str, str)
+
+    def __init__(self, name: str, load, profile: StartupProfile):
+        """Runs `load(profile)` in the background, `value` or `error` is set once it's done"""
+        super().__init__()
+
+        self.name = name
+        self.load = load
+        self.profile = profile
+        self.value = None
+        self.error: str | None = None
+
+    def run(self):
+        current_thread().name = f"load {self.name}" # shows up in the profile instead of Dummy-1
+
+        try:
+            with self.profile.measure(self.name):
+                self.value = self.load(self.profile)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.failed.emit(self.name, self.error)
+        else:
+            self.loaded.emit(self.name, self.value)
+
+
+class Startup(QtCore.QObject):
+    # name of the component and what it loaded / why it failed, emitted in the thread that owns the Startup
+    ready = QtCore.Signal(str, object)
+    failed = QtCore.Signal(str, str)
+    finished = QtCore.Signal()
+
+    def __init__(self, profile: StartupProfile | None = None):
+        """Loads the slow parts of the app (models, dictionaries) in background threads while the window is up
+
+        Args:
+            profile (StartupProfile | None, optional): Where loading times are recorded. Defaults to None (disabled).
+        """
+        super().__init__()
+
+        self.profile = profile or StartupProfile(enabled=False)
+        self._loaders: dict[str, ComponentLoader] = {}
+        self._callbacks: dict[str, list] = {}
+        self._done: set[str] = set()
+
+    def add(self, name: str, load):
+        """Registers a component, `load(profile)` returns it and runs in its own thread once `start` is called"""
+        loader = ComponentLoader(name, load, self.profile)
+        loader.loaded.connect(self._loaded)
+        loader.failed.connect(self._failed)
+        self._loaders[name] = loader
+
+    def start(self):
+        for loader in self._loaders.values():
+            loader.start()
+
+    def is_ready(self, name: str) -> bool:
+        loader = self._loaders[name]
+
+        return loader.isFinished() and loader.error is None
+
+    def get(self, name: str):
+        """The loaded component, waiting for it if it's still loading
+
+        Raises:
+            RuntimeError: If the component failed to load.
+        """
+        loader = self._loaders[name]
+        loader.wait()
+
+        if loader.error is not None:
+            raise RuntimeError(f"{name} failed to load: {loader.error}")
+
+        return loader.value
+
+    def when_ready(self, name: str, callback):
+        """Calls `callback(component)` now if it's loaded, otherwise once it is (never if it fails)"""
+        if name in self._done:
+            if self._loaders[name].error is None:
+                callback(self._loaders[name].value)
+        else:
+            self._callbacks.setdefault(name, []).append(callback)
+
+    def _loaded(self, name: str, value):
+        self._done.add(name)
+
+        for callback in self._callbacks.pop(name, []):
+            callback(value)
+
+        self.ready.emit(name, value)
+        self._check_finished()
+
+    def _failed(self, name: str, error: str):
+        self._done.add(name)
+        self._callbacks.pop(name, None)
+        self.failed.emit(name, error)
+        self._check_finished()
+
+    def _check_finished(self):
+        if len(self._done) == len(self._loaders):
+            self.finished.emit()
@@ -0,0 +1,143 @@
+import sys
+from threading import Lock, Thread
+from sudachipy import tokenizer, dictionary
+from utils.cache import LRUCache, MISSING
+
+
+class Morpheme:
+    """Plain copy of a sudachi morpheme, so cached results don't keep sudachi's morpheme lists alive
+
+    Has the same accessor methods as `sudachipy.Morpheme` that this project uses.
+    """
+    __slots__ = ("_surface", "_part_of_speech", "_dictionary_form", "_normalized_form", "_reading_form")
+
+    def __init__(self, surface: str, part_of_speech: tuple[str, ...], dictionary_form: str, normalized_form: str, reading_form: str):
+        self._surface = surface
+        self._part_of_speech = part_of_speech
+        self._dictionary_form = dictionary_form
+        self._normalized_form = normalized_form
+        self._reading_form = reading_form
+
+    def surface(self) -> str:
+        return self._surface
+
+    def raw_surface(self) -> str:
+        return self._surface
+
+    def part_of_speech(self) -> tuple[str, ...]:
+        return self._part_of_speech
+
+    def dictionary_form(self) -> str:
+        return self._dictionary_form
+
+    def normalized_form(self) -> str:
+        return self._normalized_form
+
+    def reading_form(self) -> str:
+        return self._reading_form
+
+    def __repr__(self) -> str:
+        return f"Morpheme({self._surface!r})"
+
+
+class SudachiTokenizer:
+    def __init__(self, dict_type: str = "full", cache_size: int = 10000):
+        """Sudachi tokenizer that loads its dictionary on first use and remembers recent sentences
+
+        The dictionary takes seconds and hundreds of MB to load, so it's only loaded once per process (see
+        `get_tokenizer`), either when first needed or in the background through `preload`.
+
+        Args:
+            dict_type (str, optional): Sudachi dictionary, "small", "core" or "full". Defaults to "full".
+            cache_size (int, optional): Maximum number of (sentence, split mode) results kept. Defaults to 10000.
+        """
+        self.dict_type = dict_type
+        self.cache = LRUCache(cache_size)
+
+        self._tokenizer = None
+        self._split_modes = None
+        self._load_lock = Lock()
+        self._lock = Lock() # sudachi tokenizers aren't thread-safe
+        self._part_of_speech: dict[tuple, tuple] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._tokenizer is not None
+
+    def load(self):
+        """Loads the sudachi dictionary if it isn't yet, blocking until it is"""
+        if self._tokenizer is not None:
+            return
+
+        with self._load_lock:
+            if self._tokenizer is None:
+                self._split_modes = {mode: getattr(tokenizer.Tokenizer.SplitMode, mode) for mode in "ABC"}
+                self._tokenizer = dictionary.Dictionary(dict=self.dict_type).create()
+
+    def preload(self) -> Thread:
+        """Starts loading the dictionary in a background thread, tokenizing meanwhile waits for it to finish"""
+        thread = Thread(target=self.load, daemon=True)
+        thread.start()
+
+        return thread
+
+    def tokenize(self, text: str, mode: str = "A") -> tuple[Morpheme, ...]:
+        """Splits text into morphemes
+
+        Args:
+            text (str): The text to tokenize.
+            mode (str, optional): Sudachi split mode, "A" (shortest units), "B" or "C" (named entities). Defaults to "A".
+
+        Returns:
+            tuple[Morpheme, ...]: The morphemes, shared between calls with the same text and mode.
+        """
+        key = (text, mode)
+        morphemes = self.cache.get(key)
+
+        if morphemes is not MISSING:
+            return morphemes
+
+        self.load()
+
+        with self._lock:
+            morphemes = tuple(
+                Morpheme(
+                    morpheme.raw_surface(),
+                    self._intern_part_of_speech(morpheme.part_of_speech()),
+                    morpheme.dictionary_form(),
+                    morpheme.normalized_form(),
+                    morpheme.reading_form()
+                )
+                for morpheme in self._tokenizer.tokenize(text, self._split_modes[mode])
+            )
+
+        self.cache.put(key, morphemes)
+
+        return morphemes
+
+    def _intern_part_of_speech(self, part_of_speech: tuple[str, ...]) -> tuple[str, ...]:
+        # only a few thousand combinations exist, share them instead of keeping one per morpheme
+        cached = self._part_of_speech.get(part_of_speech)
+
+        if cached is None:
+            cached = self._part_of_speech[part_of_speech] = tuple(sys.intern(p) for p in part_of_speech)
+
+        return cached
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats()
+
+
+_shared: SudachiTokenizer | None = None
+_shared_lock = Lock()
+
+
+def get_tokenizer() -> SudachiTokenizer:
+    """The process-wide tokenizer (full dictionary), nothing is loaded until it's used or preloaded"""
+    global _shared
+
+    with _shared_lock:
+        if _shared is None:
+            _shared = SudachiTokenizer()
+
+    return _shared